@@ -1,79 +1,833 @@
-import requests
+from __future__ import annotations
+
+import codecs
 import json
-from requests_toolbelt.multipart.encoder import MultipartEncoder
+import logging
+import mimetypes
+import mmap
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, BinaryIO
+
+from models import Pet, PetList, decode_pet_photo
+
+# requests, requests_toolbelt, urllib3 и модули клиента, которые их тянут, импортируются при
+# первом использовании, чтобы "from api import PetFriends" оставался дешёвым (см. test_import_time.py)
+if TYPE_CHECKING:
+    import requests
+
+    from metrics import MetricsCollector, RequestEvent
+    from photo_cache import PhotoCache
+    from sync import SyncPlan
+    from throttle import AdaptiveConcurrency, TokenBucket
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def _default_json_loads():
+    """Разбор JSON по умолчанию: orjson, если установлен, иначе стандартный json."""
+
+    try:
+        import orjson
+    except ImportError:
+        return json.loads
+    return orjson.loads
+
+# Фото питомца можно передать путём к файлу, байтами, буфером (memoryview, mmap) или открытым
+# бинарным файловым объектом
+PetPhoto = str | os.PathLike | bytes | bytearray | memoryview | mmap.mmap | BinaryIO
+
+
+class _BufferReader:
+    """Файлоподобное чтение буфера кусками без копирования всего буфера целиком.
+    Атрибут len - число ещё не прочитанных байт, как того ожидает MultipartEncoder."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    @property
+    def len(self) -> int:
+        return len(self._view) - self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return chunk
+
+    def close(self):
+        """Отпускает буфер, например чтобы BytesIO снова можно было дописывать."""
+
+        self._view.release()
+
+
+def _has_fileno(stream) -> bool:
+    try:
+        stream.fileno()
+    except (AttributeError, OSError):
+        return False
+    return True
+
+
+class _PhotoUpload:
+    """Готовит поле pet_photo для MultipartEncoder из любого PetPhoto. Тело запроса читается
+    кусками по мере отправки. Файлы, открытые здесь по пути, закрываются при выходе из with;
+    файловые объекты вызывающего кода не закрываются, а перед повторной отправкой
+    перематываются на исходную позицию; поток без перемотки (seekable() == False) вычитывается
+    в память один раз. Если передан cache, фото по пути берётся из него."""
+
+    def __init__(self, pet_photo: PetPhoto, cache: PhotoCache = None):
+        self.pet_photo = pet_photo
+        self._stack = ExitStack()
+        self._start = None
+        self.content_type = None
+
+        if cache is not None and isinstance(pet_photo, (str, os.PathLike)):
+            cached = cache.get(pet_photo)
+            self.pet_photo = cached.data
+            self.filename = cached.filename
+            self.content_type = cached.content_type
+        elif isinstance(pet_photo, (str, os.PathLike)):
+            self.filename = os.path.basename(pet_photo)
+        elif isinstance(pet_photo, (bytes, bytearray, memoryview, mmap.mmap)):
+            self.filename = 'pet_photo.jpg'
+        elif hasattr(pet_photo, 'read'):
+            name = getattr(pet_photo, 'name', None)
+            self.filename = os.path.basename(name) if isinstance(name, str) else 'pet_photo.jpg'
+            if getattr(pet_photo, 'seekable', lambda: False)():
+                self._start = pet_photo.tell()
+            else:
+                # поток без перемотки второй раз прочитать нельзя, а тело собирается заново на
+                # каждую попытку (после 403 или 429), поэтому остаток читается здесь один раз
+                self.pet_photo = pet_photo.read()
+        else:
+            raise TypeError('pet_photo must be a path, bytes-like object or binary file, '
+                            'got %s' % type(pet_photo).__name__)
+
+        if self.content_type is None:
+            self.content_type = mimetypes.guess_type(self.filename)[0] or 'image/jpeg'
+
+    def field(self) -> tuple:
+        """Возвращает кортеж (имя файла, поток, content-type), готовый к новой отправке."""
+
+        if isinstance(self.pet_photo, (str, os.PathLike)):
+            stream = self._stack.enter_context(open(self.pet_photo, 'rb'))
+        elif isinstance(self.pet_photo, (bytes, bytearray, memoryview, mmap.mmap)):
+            stream = _BufferReader(self.pet_photo)
+        else:
+            stream = self.pet_photo
+            if self._start is not None:
+                stream.seek(self._start)
+            if not _has_fileno(stream):
+                # MultipartEncoder берёт у объектов с getvalue() всё содержимое целиком, мимо
+                # текущей позиции, поэтому отдаём ему только остаток: у BytesIO - без копирования
+                if hasattr(stream, 'getbuffer'):
+                    stream = _BufferReader(stream.getbuffer()[stream.tell():])
+                    self._stack.callback(stream.close)
+                else:
+                    stream = _BufferReader(stream.read())
+        return self.filename, stream, self.content_type
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stack.close()
+
+
+class BulkOutcome(namedtuple('BulkOutcome', 'item status result')):
+    """Результат одной операции группового метода: исходный элемент (описание питомца или id),
+    статус ответа и результат. Если запрос завершился исключением, status равен None,
+    а в result лежит само исключение."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+
+class BulkRun:
+    """Выполнение группового метода. Запросы начинают выполняться сразу при вызове метода в
+    фоновом потоке, так что результат можно и не читать: pf.delete_pets(auth_key, ids) удалит
+    питомцев. Одновременно выполняется не больше workers запросов, а элементы items берутся
+    не больше чем на 2*workers запросов вперёд, поэтому items может быть длинным генератором.
+
+    Итерация по объекту отдаёт BulkOutcome по мере завершения запросов; wait() дожидается
+    окончания и возвращает ещё не прочитанные результаты списком; cancel() перестаёт брать новые
+    элементы. PetFriends.close() дожидается окончания всех запущенных групповых методов.
+    """
+
+    _done = object()
+
+    def __init__(self, operation, items, workers: int, runs: set = None):
+        """runs - множество выполняющихся BulkRun клиента, объект числится в нём до окончания."""
+
+        import queue
+
+        self._outcomes = queue.Queue()
+        self._cancelled = False
+        self._error = None
+        self._finished = False
+        self._runs = runs if runs is not None else set()
+        self._runs.add(self)
+        self._thread = threading.Thread(target=self._feed, args=(operation, items, workers),
+                                        name='petfriends-bulk-feed', daemon=True)
+        self._thread.start()
+
+    def _feed(self, operation, items, workers: int):
+        from concurrent.futures import ThreadPoolExecutor
+
+        window = threading.Semaphore(workers * 2)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='petfriends-bulk')
+
+        def run(item):
+            try:
+                status, result = operation(item)
+            except Exception as e:
+                status, result = None, e
+            self._outcomes.put(BulkOutcome(item, status, result))
+            window.release()
 
+        try:
+            for item in items:
+                window.acquire()
+                if self._cancelled:
+                    break
+                executor.submit(run, item)
+        except Exception as e:
+            # ошибка самого items отдаётся читателю после всех результатов
+            self._error = e
+        finally:
+            executor.shutdown(wait=True)
+            self._outcomes.put(self._done)
+            self._runs.discard(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> BulkOutcome:
+        if self._finished:
+            raise StopIteration
+        outcome = self._outcomes.get()
+        if outcome is self._done:
+            self._finished = True
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        return outcome
+
+    def wait(self) -> list:
+        return list(self)
+
+    def join(self):
+        """Дожидается окончания всех запросов, не читая результаты."""
+
+        self._thread.join()
+
+    def cancel(self):
+        self._cancelled = True
+
+
+# Закэшированный ответ на GET api/pets: валидаторы для условного запроса и разобранный JSON
+_CachedListing = namedtuple('_CachedListing', 'etag last_modified fetched_at result')
+
+
+def _copy_listing(result: dict) -> dict:
+    """Копия ответа со списком питомцев; значения полей питомцев - строки, так что двух уровней
+    копирования достаточно."""
+
+    pets = result.get('pets')
+    if not isinstance(pets, list):
+        return dict(result)
+    return dict(result, pets=[dict(pet) if isinstance(pet, dict) else pet for pet in pets])
+
+
+def _counted(chunks, event: RequestEvent):
+    """Пропускает куски ответа, добавляя их размер и время загрузки в event."""
+
+    chunks = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        chunk = next(chunks, None)
+        event.phases['download'] += time.perf_counter() - started
+        if chunk is None:
+            return
+        event.bytes_received += len(chunk)
+        yield chunk
+
+
+def _iter_json_array(chunks, key: str):
+    """Разбирает JSON объект вида {key: [...]} по мере поступления кусков байт и отдаёт элементы
+    массива по одному. В памяти держится только ещё не разобранный хвост, то есть не больше
+    одного элемента и одного куска."""
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buf = ''
+
+    def read_more() -> bool:
+        nonlocal buf
+        for chunk in chunks:
+            if chunk:
+                buf += text_decoder.decode(chunk)
+                return True
+        return False
+
+    marker = '"%s"' % key
+    while True:
+        start = buf.find(marker)
+        if start >= 0:
+            start = buf.find('[', start + len(marker))
+            if start >= 0:
+                break
+        if not read_more():
+            return
+
+    pos = start + 1
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buf):
+            if not read_more():
+                raise ValueError('unexpected end of JSON array %r' % key)
+            continue
+        if buf[pos] == ']':
+            return
 
-class PetFriends:
-    """библиотека API для веб приложения Pet Friends"""
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not read_more():
+                raise
+            continue
+
+        # число или литерал на границе куска разбирается и в обрезанном виде ("12" из "12345",
+        # "12" из "12.5"), поэтому элемент принимается, только когда за ним уже видны ',' или ']'
+        after = end
+        while after < len(buf) and buf[after] in ' \t\r\n':
+            after += 1
+        if after >= len(buf) or buf[after] not in ',]':
+            if read_more():
+                continue
+            if after >= len(buf):
+                raise ValueError('unexpected end of JSON array %r' % key)
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, after)
+
+        yield item
+        buf = buf[end:]
+        pos = 0
+
+
+def _endpoint(path: str) -> str:
+    """Путь запроса без id питомца для группировки метрик: 'api/pets/<id>' -> 'api/pets/{id}'."""
+
+    parts = path.split('/')
+    if len(parts) > 2:
+        parts[-1] = '{id}'
+    return '/'.join(parts)
 
-    def __init__(self):
-        self.base_url = 'https://petfriends1.herokuapp.com/'
+
+class PetFriends:
+    """библиотека API для веб приложения Pet Friends
+
+    Все запросы идут через одну сессию requests с пулом keep-alive соединений, поэтому
+    TCP/TLS рукопожатие с сервером выполняется один раз на соединение, а не на каждый вызов.
+    Сессию можно закрыть явно методом close() либо использовать клиент как контекстный менеджер:
+
+        with PetFriends(pool_size=20) as pf:
+            status, auth_key = pf.get_api_key(email, password)
+
+    Если передан photo_cache (см. photo_cache.PhotoCache), фото, заданные путём к файлу, читаются
+    с диска и проверяются один раз, а повторные загрузки того же файла берут его из памяти.
+
+    В режиме typed=True успешные ответы с питомцами возвращаются не словарями, а компактными
+    записями Pet, а список питомцев - объектом PetList с индексом по id (см. models.py).
+
+    С response_cache=True списки питомцев кэшируются по (auth_key, filter). Повторный запрос
+    отправляется условным (If-None-Match / If-Modified-Since), и ответ 304 отдаётся из кэша, а
+    в течение cache_max_age секунд кэш отдаётся вовсе без запроса. Любой изменяющий запрос этого
+    клиента (добавление, изменение, удаление питомца, загрузка фото) сбрасывает кэш.
+
+    Если передан metrics (например, metrics.MetricsCollector), для каждого запроса в него
+    передаётся RequestEvent с длительностями фаз (соединение, ожидание ответа, загрузка,
+    сборка тела, разбор JSON), объёмом отправленных и полученных данных и числом повторов.
+    Без metrics замеры не выполняются.
+
+    С record_path все запросы и ответы дописываются в журнал (см. cassette.py), а с replay_path
+    клиент не ходит в сеть и отдаёт ответы из ранее записанного журнала.
+
+    Частоту запросов можно ограничить общим для потоков и клиентов rate_limiter, а число
+    одновременных запросов - concurrency_limiter, который подстраивается под задержки и ошибки
+    сервера. На ответ 429 клиент ждёт время из заголовка Retry-After (или экспоненциальную
+    задержку) и повторяет запрос не более max_retries раз.
+
+    Методы ничего не печатают. Каждый ответ пишется в лог 'api' на уровне DEBUG (метод, путь,
+    статус, размер), по умолчанию этот лог никуда не выводится.
+
+    Полученные ключи кэшируются на key_ttl секунд для каждой пары (email, password). Если сервер
+    отвечает 403 на запрос с ключом из кэша, клиент один раз логинится заново, подменяет значение
+    auth_key['key'] в переданном словаре и повторяет запрос.
+    """
+
+    def __init__(self, base_url: str = None, pool_size: int = 10, max_retries: int = 3,
+                 backoff_factor: float = 0.3, timeout: float | tuple = (5, 30), key_ttl: float = 600,
+                 photo_cache: PhotoCache = None, typed: bool = False,
+                 response_cache: bool = False, cache_max_age: float = 0,
+                 metrics: MetricsCollector = None, json_loads=None,
+                 record_path: str = None, replay_path: str = None,
+                 rate_limiter: TokenBucket = None, concurrency_limiter: AdaptiveConcurrency = None):
+        """base_url - адрес сервера, по умолчанию - публичный Pet Friends (для тестов без сети
+        сюда передаётся адрес fake_server.FakePetFriendsServer);
+        pool_size - максимальное число одновременно открытых соединений с сервером;
+        max_retries - число повторов при ошибках соединения, ответах 502/503/504 и 429;
+        backoff_factor - множитель экспоненциальной задержки между повторами;
+        timeout - таймаут запроса в секундах, либо кортеж (connect, read);
+        key_ttl - время жизни ключа в кэше в секундах, 0 отключает кэш;
+        photo_cache - кэш фото для повторно загружаемых файлов;
+        typed - возвращать вместо словарей записи models.Pet и списки models.PetList;
+        response_cache - кэшировать списки питомцев и перезапрашивать их условными запросами;
+        cache_max_age - сколько секунд отдавать закэшированный список без запроса к серверу;
+        metrics - получатель замеров запросов, любой объект с методом record(event);
+        json_loads - функция разбора JSON из байт, по умолчанию orjson.loads, если orjson
+        установлен, иначе json.loads;
+        record_path - файл журнала, в который записываются все запросы и ответы;
+        replay_path - файл журнала, из которого отдаются ответы вместо запросов к серверу;
+        rate_limiter - общий ограничитель частоты запросов throttle.TokenBucket;
+        concurrency_limiter - адаптивный лимит одновременных запросов throttle.AdaptiveConcurrency."""
+
+        self.base_url = (base_url or 'https://petfriends1.herokuapp.com/').rstrip('/') + '/'
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.key_ttl = key_ttl
+        self.photo_cache = photo_cache
+        self.typed = typed
+        self.response_cache = response_cache
+        self.cache_max_age = cache_max_age
+        self.metrics = metrics
+        self.json_loads = json_loads or _default_json_loads()
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+
+        # (auth_key, filter) -> _CachedListing; поколение растёт при каждом сбросе кэша, чтобы
+        # ответ, полученный до сброса, не попал в кэш после него
+        self._listings = {}
+        self._listings_generation = 0
+        self._listings_lock = threading.Lock()
+
+        # (email, password) -> (момент устаревания, ключ) и обратный индекс
+        # ключ -> (момент устаревания, (email, password)), в котором ключ остаётся и после замены
+        self._keys = {}
+        self._key_owners = {}
+        self._keys_lock = threading.Lock()
+        self._login_locks = {}
+
+        # групповые методы, которые ещё выполняются в фоне
+        self._bulk_runs = set()
+
+        self.session = self._make_session(record_path, replay_path)
+
+    def _make_session(self, record_path: str = None, replay_path: str = None) -> requests.Session:
+        """Создаёт сессию requests с пулом соединений и повторами при сетевых ошибках и 5xx."""
+
+        import requests
+        from urllib3.util.retry import Retry
+
+        retry = Retry(total=self.max_retries, backoff_factor=self.backoff_factor,
+                      status_forcelist=(502, 503, 504), raise_on_status=False)
+        if replay_path is not None:
+            from cassette import ReplayAdapter
+            adapter = ReplayAdapter(replay_path)
+        elif record_path is not None:
+            # RecordingAdapter основан на TimedHTTPAdapter, фаза connect в metrics сохраняется
+            from cassette import RecordingAdapter
+            adapter = RecordingAdapter(record_path, pool_connections=1, pool_maxsize=self.pool_size,
+                                       max_retries=retry)
+        elif self.metrics is not None:
+            from metrics import TimedHTTPAdapter
+            adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        else:
+            from requests.adapters import HTTPAdapter
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        """Дожидается окончания групповых методов и закрывает сессию и все соединения пула."""
+
+        for run in list(self._bulk_runs):
+            run.join()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _send(self, method: str, path: str, auth_key: dict = None, headers: dict = None,
+              data=None, **kwargs) -> requests.Response:
+        """Отправляет запрос к API через общую сессию с таймаутом по умолчанию.
+        Если передан auth_key, ключ подставляется в заголовки, а при ответе 403 на устаревший
+        ключ из кэша запрос повторяется один раз с новым ключом. Ответ 429 повторяется после
+        паузы из Retry-After. data может быть функцией без аргументов - тогда тело запроса
+        (например, MultipartEncoder) собирается заново на каждую попытку."""
+
+        kwargs.setdefault('timeout', self.timeout)
+        url = self.base_url + path
+        stream = kwargs.get('stream', False)
+        event = None
+        if self.metrics is not None:
+            # тело ответа читается в _measure, чтобы замерить его загрузку отдельно от ожидания
+            kwargs['stream'] = True
+            from metrics import RequestEvent, reset_connect_timing
+            event = RequestEvent(_endpoint(path), method)
+            reset_connect_timing()
+            started = time.perf_counter()
+
+        attempt = 0
+        renewed = False
+        sent_key = None
+        while True:
+            request_headers = dict(headers or {})
+            if auth_key is not None:
+                # auth_key может одновременно обновить другой поток, поэтому запоминаем,
+                # с каким именно ключом ушёл запрос
+                sent_key = request_headers['auth_key'] = auth_key['key']
+
+            if event is None:
+                body = data() if callable(data) else data
+            else:
+                encode_started = time.perf_counter()
+                body = data() if callable(data) else data
+                event.phases['encode'] += time.perf_counter() - encode_started
+
+            # потоковое тело MultipartEncoder само знает свой Content-Type с границей
+            content_type = getattr(body, 'content_type', None)
+            if content_type is not None:
+                request_headers['Content-Type'] = content_type
+
+            res = self._request(method, url, headers=request_headers, data=body, **kwargs)
+            if event is not None:
+                self._measure(event, res, body, attempt, stream)
+            if method != 'GET' and self._listings:
+                # запрос мог изменить питомцев, закэшированные списки больше не актуальны
+                self.clear_response_cache()
+
+            if res.status_code == 429 and attempt < self.max_retries:
+                self._wait_retry_after(res, attempt)
+            elif (res.status_code == 403 and auth_key is not None and not renewed
+                  and self._renew_key(auth_key, sent_key)):
+                renewed = True
+            else:
+                if event is not None:
+                    event.total = time.perf_counter() - started
+                    res.event = event
+                return res
+            res.close()
+            attempt += 1
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Один запрос через сессию с учётом rate_limiter и concurrency_limiter."""
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if self.concurrency_limiter is None:
+            return self.session.request(method, url, **kwargs)
+
+        self.concurrency_limiter.acquire()
+        started = time.monotonic()
+        status = None
+        try:
+            res = self.session.request(method, url, **kwargs)
+            status = res.status_code
+            return res
+        finally:
+            self.concurrency_limiter.release(status, time.monotonic() - started)
+
+    def _wait_retry_after(self, res: requests.Response, attempt: int):
+        """Ждёт перед повтором ответа 429: время из Retry-After, либо экспоненциальную задержку.
+        С общим rate_limiter пауза действует на все потоки, а не только на текущий."""
+
+        from throttle import retry_after
+
+        delay = retry_after(res.headers.get('Retry-After'))
+        if delay is None:
+            delay = self.backoff_factor * 2 ** attempt
+        logger.debug('%s %s -> 429, retry in %.2fs', res.request.method, res.request.path_url, delay)
+        if self.rate_limiter is not None:
+            self.rate_limiter.pause(delay)
+        time.sleep(delay)
+
+    @staticmethod
+    def _measure(event: RequestEvent, res: requests.Response, body, attempt: int, stream: bool):
+        """Дописывает в event замеры очередной попытки запроса."""
+
+        from metrics import connect_timing, reset_connect_timing
+
+        elapsed = res.elapsed.total_seconds()
+        connect = connect_timing()
+        reset_connect_timing()
+        event.status = res.status_code
+        event.phases['connect'] += connect
+        event.phases['wait'] += max(elapsed - connect, 0.0)
+        history = getattr(getattr(res.raw, 'retries', None), 'history', ())
+        # повторы внутри urllib3 плюс сама эта попытка, если она не первая
+        event.retries += len(history) + (1 if attempt else 0)
+
+        if hasattr(body, 'content_type'):
+            event.bytes_sent += body.len
+        elif res.request.body is not None:
+            event.bytes_sent += len(res.request.body)
+        if not stream:
+            download_started = time.perf_counter()
+            event.bytes_received += len(res.content)
+            event.phases['download'] += time.perf_counter() - download_started
+
+    def _decode(self, res: requests.Response):
+        """Разбирает тело ответа по Content-Type: JSON - функцией json_loads, всё остальное
+        (например, HTML страница ошибки) отдаётся текстом."""
+
+        if 'json' in res.headers.get('Content-Type', ''):
+            try:
+                return self.json_loads(res.content)
+            except ValueError:
+                pass
+        return res.text
+
+    def _result(self, res: requests.Response):
+        """Единая обработка ответа для всех методов: разбор тела, метрики и отладочный лог.
+        При включённых метриках замеряет разбор и передаёт событие запроса в metrics."""
+
+        event = getattr(res, 'event', None)
+        if event is None:
+            result = self._decode(res)
+        else:
+            decode_started = time.perf_counter()
+            result = self._decode(res)
+            event.phases['decode'] = time.perf_counter() - decode_started
+            self.metrics.record(event)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s %s -> %s (%d bytes)', res.request.method, res.request.path_url,
+                         res.status_code, len(res.content),
+                         extra={'method': res.request.method, 'path': res.request.path_url,
+                                'status': res.status_code, 'bytes_received': len(res.content)})
+        return result
+
+    def clear_response_cache(self):
+        """Сбрасывает закэшированные списки питомцев."""
+
+        with self._listings_lock:
+            self._listings.clear()
+            self._listings_generation += 1
+
+    def _login_lock(self, credentials: tuple) -> threading.Lock:
+        """Возвращает блокировку для пары (email, password), чтобы логин выполнялся один раз,
+        даже если ключ одновременно нужен нескольким потокам."""
+
+        with self._keys_lock:
+            return self._login_locks.setdefault(credentials, threading.Lock())
+
+    def _cached_key(self, credentials: tuple) -> str | None:
+        """Возвращает ключ из кэша, если он ещё не устарел."""
+
+        entry = self._keys.get(credentials)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _store_key(self, credentials: tuple, key: str):
+        now = time.monotonic()
+        with self._keys_lock:
+            self._keys[credentials] = (now + self.key_ttl, key)
+            # ключи, заменённые больше key_ttl назад, уже не придут в ответах 403
+            for old_key, (expires_at, _) in list(self._key_owners.items()):
+                if expires_at + self.key_ttl < now:
+                    del self._key_owners[old_key]
+            self._key_owners[key] = (now + self.key_ttl, credentials)
+
+    def _forget_key(self, key: str):
+        """Убирает ключ из кэша. Обратный индекс не трогается: запросы, ушедшие с этим ключом,
+        ещё могут вернуть 403, и по нему нужно найти, за кого перелогиниться."""
+
+        with self._keys_lock:
+            _, credentials = self._key_owners.get(key, (0, None))
+            if credentials is not None and self._keys.get(credentials, (0, None))[1] == key:
+                del self._keys[credentials]
+
+    def _renew_key(self, auth_key: dict, stale_key: str) -> bool:
+        """Заменяет в auth_key ключ stale_key, на который сервер ответил 403, на новый.
+        Если ключ уже обновил другой поток, берётся его ключ без повторного логина.
+        Возвращает False, если ключ получен не через кэш этого клиента и перелогиниться не с чем."""
+
+        _, credentials = self._key_owners.get(stale_key, (0, None))
+        if credentials is None:
+            return False
+
+        with self._login_lock(credentials):
+            fresh_key = self._cached_key(credentials)
+            if fresh_key is None or fresh_key == stale_key:
+                self._forget_key(stale_key)
+                status, result = self._login(*credentials)
+                if status != 200 or 'key' not in result:
+                    return False
+                fresh_key = result['key']
+                self._store_key(credentials, fresh_key)
+
+        auth_key['key'] = fresh_key
+        return True
+
+    def _as_pet(self, status: int, result):
+        """В режиме typed превращает успешный ответ с питомцем в Pet."""
+
+        if self.typed and status == 200 and isinstance(result, dict):
+            return Pet.from_dict(result)
+        return result
+
+    def _as_pets(self, status: int, result):
+        """В режиме typed превращает успешный ответ со списком питомцев в PetList."""
+
+        if self.typed and status == 200 and isinstance(result, dict):
+            return PetList.from_dicts(result.get('pets', ()))
+        return result
 
     def get_api_key(self, email: str, password: str) -> json:
         """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате
         JSON с уникальным ключом пользователя, найденного по указанным email и паролю.
+        Пока ключ не устарел (см. key_ttl), он возвращается из кэша без запроса к серверу.
         Здесь отрабатывается GET API запрос."""
 
+        if not self.key_ttl:
+            return self._login(email, password)
+
+        credentials = (email, password)
+        key = self._cached_key(credentials)
+        if key is None:
+            with self._login_lock(credentials):
+                key = self._cached_key(credentials)
+                if key is None:
+                    status, result = self._login(email, password)
+                    if status != 200 or 'key' not in result:
+                        return status, result
+                    key = result['key']
+                    self._store_key(credentials, key)
+
+        return 200, {'key': key}
+
+    def _login(self, email: str, password: str) -> json:
+        """Запрашивает у сервера новый ключ, минуя кэш."""
+
         headers = {
             'email': email,
             'password': password
         }
 
-        res = requests.get(self.base_url + 'api/key', headers=headers)
+        res = self._send('GET', 'api/key', headers=headers)
         status = res.status_code
-        result = ''
-
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
+        result = self._result(res)
         return status, result
 
     def get_list_of_pets(self, auth_key: json, filter: str = '') -> json:
         """Метод делает запрос к API сервера и возвращает статус запроса и результат в формате JSON
         со списком найденных питомцев, совпадающих с фильтром. На данный момент фильтр может иметь
         либо пустое значение - получить список всех питомцев, либо 'my_pets' - получить список
-        собственных питомцев. Здесь отрабатывается GET API запрос."""
-
-        headers = {'auth_key': auth_key['key']}
-        filter = {'filter': filter}
+        собственных питомцев. При включённом response_cache список может быть отдан из кэша.
+        Здесь отрабатывается GET API запрос."""
 
-        res = requests.get(self.base_url + 'api/pets', headers=headers, params=filter)
+        cached = None
+        headers = {}
+        if self.response_cache:
+            generation = self._listings_generation
+            cached = self._listings.get((auth_key['key'], filter))
+            if cached is not None:
+                if time.monotonic() - cached.fetched_at < self.cache_max_age:
+                    return 200, self._as_pets(200, _copy_listing(cached.result))
+                if cached.etag:
+                    headers['If-None-Match'] = cached.etag
+                if cached.last_modified:
+                    headers['If-Modified-Since'] = cached.last_modified
+
+        res = self._send('GET', 'api/pets', auth_key, headers=headers, params={'filter': filter})
         status = res.status_code
-        result = ''
+        result = self._result(res)
+
+        if status == 304 and cached is not None:
+            status, result = 200, cached.result
+
+        if self.response_cache and status == 200 and isinstance(result, dict):
+            etag = res.headers.get('ETag', cached.etag if cached else None)
+            last_modified = res.headers.get('Last-Modified', cached.last_modified if cached else None)
+            if etag or last_modified or self.cache_max_age:
+                with self._listings_lock:
+                    if self._listings_generation == generation:
+                        self._listings[(auth_key['key'], filter)] = _CachedListing(
+                            etag, last_modified, time.monotonic(), result)
+            # в кэше лежит исходный объект, вызывающий код получает копию и может её менять
+            result = _copy_listing(result)
+        return status, self._as_pets(status, result)
+
+    def iter_pets(self, auth_key: json, filter: str = '', with_photo: bool = False,
+                  chunk_size: int = 64 * 1024):
+        """Генератор питомцев по тому же запросу, что и get_list_of_pets, но ответ сервера
+        разбирается потоково: питомцы отдаются по одному по мере загрузки, и память не растёт
+        вместе с размером списка. По умолчанию поле pet_photo отбрасывается; с with_photo=True
+        оно остаётся строкой в base64 и декодируется по требованию функцией decode_pet_photo.
+        В режиме typed отдаются записи Pet.
+        При ответе сервера с ошибкой выбрасывается requests.HTTPError."""
+
+        res = self._send('GET', 'api/pets', auth_key, params={'filter': filter}, stream=True)
+        event = getattr(res, 'event', None)
+        chunks = res.iter_content(chunk_size)
+        if event is not None:
+            chunks = _counted(chunks, event)
 
         try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
-        return status, result
+            with res:
+                res.raise_for_status()
+                for pet in _iter_json_array(chunks, 'pets'):
+                    if not with_photo:
+                        pet.pop('pet_photo', None)
+                    yield Pet.from_dict(pet) if self.typed else pet
+        finally:
+            # запрос учитывается и тогда, когда питомцев перестали читать на середине списка
+            if event is not None:
+                self.metrics.record(event)
 
     def add_new_pet(self, auth_key: json, name: str, animal_type: str,
-                    age: str, pet_photo: str) -> json:
+                    age: str, pet_photo: PetPhoto) -> json:
         """Метод отправляет (постит) на сервер данные о добавляемом питомце и возвращает статус
         запроса на сервер и результат в формате JSON с данными добавленного питомца.
+        Фото передаётся путём к файлу, байтами, буфером или открытым бинарным файлом.
         Здесь отрабатывается POST API запрос."""
 
-        data = MultipartEncoder(
-            fields={
-                'name': name,
-                'animal_type': animal_type,
-                'age': age,
-                'pet_photo': (pet_photo, open(pet_photo, 'rb'), 'image/jpeg')
-            })
+        from requests_toolbelt.multipart.encoder import MultipartEncoder
 
-        headers = {'auth_key': auth_key['key'], 'Content-Type': data.content_type}
+        with _PhotoUpload(pet_photo, self.photo_cache) as photo:
+            def data():
+                return MultipartEncoder(
+                    fields={
+                        'name': name,
+                        'animal_type': animal_type,
+                        'age': age,
+                        'pet_photo': photo.field()
+                    })
 
-        res = requests.post(self.base_url + 'api/pets', headers=headers, data=data)
+            res = self._send('POST', 'api/pets', auth_key, data=data)
         status = res.status_code
-        result = ''
-
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
-        print('Это я печатаю из АПИ', result)
-        return status, result
+        result = self._result(res)
+        return status, self._as_pet(status, result)
 
     def delete_pet(self, auth_key: json, pet_id: str) -> json:
         """Метод отправляет на сервер запрос на удаление питомца по указанному ID и возвращает
@@ -81,16 +835,9 @@ class PetFriends:
         На сегодняшний день тут есть баг - в result приходит пустая строка, но status при этом = 200.
         Здесь отрабатывается DELETE API запрос."""
 
-        headers = {'auth_key': auth_key['key']}
-
-        res = requests.delete(self.base_url + 'api/pets/' + pet_id, headers=headers)
+        res = self._send('DELETE', 'api/pets/' + pet_id, auth_key)
         status = res.status_code
-        result = ''
-
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
+        result = self._result(res)
         return status, result
 
     def update_pet_info(self, auth_key: json, pet_id: str, name: str,
@@ -99,22 +846,16 @@ class PetFriends:
         возвращает статус запроса и result в формате JSON с обновлённыи данными питомца.
         Здесь отрабатывается PUT API запрос."""
 
-        headers = {'auth_key': auth_key['key']}
         data = {
             'name': name,
             'age': age,
             'animal_type': animal_type
         }
 
-        res = requests.put(self.base_url + 'api/pets/' + pet_id, headers=headers, data=data)
+        res = self._send('PUT', 'api/pets/' + pet_id, auth_key, data=data)
         status = res.status_code
-        result = ''
-
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
-        return status, result
+        result = self._result(res)
+        return status, self._as_pet(status, result)
 
     def add_new_pet_without_photo(self, auth_key: json, name: str,
                                   animal_type: str, age: str) -> json:
@@ -128,36 +869,121 @@ class PetFriends:
                 'age': age,
             }
 
-        headers = {'auth_key': auth_key['key']}
-
-        res = requests.post(self.base_url + 'api/create_pet_simple', headers=headers, data=data)
+        res = self._send('POST', 'api/create_pet_simple', auth_key, data=data)
         status = res.status_code
-        result = ''
+        result = self._result(res)
+        return status, self._as_pet(status, result)
 
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
-        print(result)
-        return status, result
-
-    def add_foto_of_pet(self, auth_key: json, pet_id: str, pet_photo: str) -> json:
+    def add_foto_of_pet(self, auth_key: json, pet_id: str, pet_photo: PetPhoto) -> json:
         """Метод отправляет запрос на сервер на добавление данных питомца - фото - по указанному ID
         и возвращает статус запроса и result в формате JSON с обновлённыи данными питомца.
-        Здесь отрабатывается POST API запрос."""
+        Фото передаётся так же, как в add_new_pet. Здесь отрабатывается POST API запрос."""
 
-        data = MultipartEncoder(
-            fields={'pet_photo': (pet_photo, open(pet_photo, 'rb'), 'image/jpeg')})
+        from requests_toolbelt.multipart.encoder import MultipartEncoder
 
-        headers = {'auth_key': auth_key['key'], 'Content-Type': data.content_type}
+        with _PhotoUpload(pet_photo, self.photo_cache) as photo:
+            def data():
+                return MultipartEncoder(fields={'pet_photo': photo.field()})
 
-        res = requests.post(self.base_url + '/api/pets/set_photo/' + pet_id, headers=headers, data=data)
+            res = self._send('POST', 'api/pets/set_photo/' + pet_id, auth_key, data=data)
         status = res.status_code
-        result = ''
+        result = self._result(res)
+        return status, self._as_pet(status, result)
 
-        try:
-            result = res.json()
-        except json.decoder.JSONDecodeError:
-            result = res.text
-        print(result)
-        return status, result
+    def _run_bulk(self, operation, items, workers: int = None, rate: float = None) -> BulkRun:
+        """Запускает operation(item) для каждого элемента в пуле из workers потоков (по умолчанию
+        по размеру пула соединений) и возвращает BulkRun, отдающий BulkOutcome по мере
+        завершения запросов. rate ограничивает число запросов в секунду."""
+
+        from throttle import TokenBucket
+
+        limiter = TokenBucket(rate, burst=1) if rate else None
+
+        def run(item):
+            if limiter is not None:
+                limiter.acquire()
+            return operation(item)
+
+        return BulkRun(run, items, workers or self.pool_size, self._bulk_runs)
+
+    def create_pets(self, auth_key: json, pets, workers: int = None, rate: float = None):
+        """Групповое добавление питомцев. pets - итерируемый набор словарей с ключами name,
+        animal_type, age и необязательным pet_photo (без него используется
+        add_new_pet_without_photo). Запросы начинают выполняться сразу; возвращается BulkRun,
+        который отдаёт BulkOutcome по мере их завершения. Неудачные запросы не прерывают
+        остальные, их можно отобрать по outcome.ok."""
+
+        return self._run_bulk(lambda pet: self._create_pet(auth_key, pet), pets, workers, rate)
+
+    def _create_pet(self, auth_key: json, pet) -> json:
+        """Добавляет питомца по словарю описания, с фото или без него."""
+
+        if pet.get('pet_photo'):
+            return self.add_new_pet(auth_key, pet['name'], pet['animal_type'], pet['age'], pet['pet_photo'])
+        return self.add_new_pet_without_photo(auth_key, pet['name'], pet['animal_type'], pet['age'])
+
+    def delete_pets(self, auth_key: json, pet_ids, workers: int = None, rate: float = None):
+        """Групповое удаление питомцев по id. Результаты - как в create_pets."""
+
+        return self._run_bulk(lambda pet_id: self.delete_pet(auth_key, pet_id), pet_ids, workers, rate)
+
+    def update_pets(self, auth_key: json, pets, workers: int = None, rate: float = None):
+        """Групповое обновление питомцев. pets - итерируемый набор словарей с ключами id, name,
+        animal_type и age. Результаты - как в create_pets."""
+
+        def update(pet):
+            return self.update_pet_info(auth_key, pet['id'], pet['name'], pet['animal_type'], pet['age'])
+
+        return self._run_bulk(update, pets, workers, rate)
+
+    def plan_sync(self, auth_key: json, pets) -> SyncPlan:
+        """Запрашивает my_pets один раз и строит план sync.SyncPlan, приводящий питомцев
+        пользователя к набору pets (см. sync.plan_sync). Сам план ничего не меняет на сервере.
+        При ответе сервера с ошибкой выбрасывается requests.HTTPError."""
+
+        from sync import plan_sync
+
+        # список берётся мимо response_cache: план должен строиться по свежему состоянию
+        res = self._send('GET', 'api/pets', auth_key, params={'filter': 'my_pets'})
+        res.raise_for_status()
+        return plan_sync(self._result(res)['pets'], pets, self.photo_cache)
+
+    def apply_sync(self, auth_key: json, plan: SyncPlan, workers: int = None, rate: float = None):
+        """Выполняет план синхронизации в пуле потоков. Шаги одной операции (например, update и
+        set_photo одного питомца) идут по порядку, разные питомцы - параллельно. Возвращает
+        BulkRun, как create_pets; в item каждого BulkOutcome - SyncOperation, в status и result -
+        ответ последнего выполненного шага. На первом неудачном шаге операция прерывается."""
+
+        def run(operation):
+            for step in operation.steps:
+                status, result = self._sync_step(auth_key, step, operation)
+                if status != 200:
+                    break
+            return status, result
+
+        return self._run_bulk(run, plan.operations, workers, rate)
+
+    def _sync_step(self, auth_key: json, step: str, operation) -> json:
+        pet = operation.pet
+        if step == 'create':
+            return self._create_pet(auth_key, pet)
+        if step == 'update':
+            return self.update_pet_info(auth_key, operation.pet_id, pet['name'], pet['animal_type'], pet['age'])
+        if step == 'set_photo':
+            return self.add_foto_of_pet(auth_key, operation.pet_id, pet['pet_photo'])
+        return self.delete_pet(auth_key, operation.pet_id)
+
+    def sync_pets(self, auth_key: json, pets, workers: int = None, rate: float = None):
+        """Декларативная синхронизация: приводит питомцев пользователя к набору pets, выполняя
+        только нужные запросы. Например, сброс тестового аккаунта к снимку:
+
+            status, snapshot = pf.get_list_of_pets(auth_key, 'my_pets')
+            ...
+            for outcome in pf.sync_pets(auth_key, snapshot['pets']):
+                assert outcome.ok
+
+        pets - словари (или записи Pet) с ключами name, animal_type, age и необязательными
+        pet_photo и id; пустой набор удаляет всех питомцев. Запросы плана, как и в create_pets,
+        выполняются в фоне сразу, pf.sync_pets(auth_key, pets).wait() дожидается их окончания."""
+
+        return self.apply_sync(auth_key, self.plan_sync(auth_key, pets), workers, rate)
@@ -0,0 +1,114 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from api import PetFriends
+
+
+class AsyncPetFriends:
+    """асинхронная версия библиотеки API для веб приложения Pet Friends
+
+    Методы повторяют методы PetFriends, но являются корутинами. Запросы выполняются в пуле потоков
+    поверх одного общего клиента PetFriends, поэтому соединения пула, кэш ключей и повторы при
+    ошибках общие для всех задач. Число одновременно выполняемых запросов ограничено семафором
+    concurrency, под это же число подбирается размер пула соединений:
+
+        async with AsyncPetFriends(concurrency=20) as apf:
+            _, auth_key = await apf.get_api_key(email, password)
+            results = await apf.delete_pets(auth_key, pet_ids)
+    """
+
+    def __init__(self, concurrency: int = 10, client: PetFriends = None, **kwargs):
+        """concurrency - максимальное число одновременных запросов;
+        client - готовый клиент PetFriends, иначе он создаётся с pool_size=concurrency и
+        остальными параметрами из kwargs."""
+
+        self._owns_client = client is None
+        self.client = client or PetFriends(pool_size=concurrency, **kwargs)
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency,
+                                            thread_name_prefix='petfriends')
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def _call(self, method, *args):
+        """Выполняет блокирующий метод клиента в пуле потоков, соблюдая лимит concurrency."""
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(method, *args))
+
+    async def aclose(self):
+        """Дожидается завершения запросов и закрывает пул потоков и, если клиент был создан
+        здесь, его сессию."""
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+        if self._owns_client:
+            self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def get_api_key(self, email: str, password: str):
+        """Асинхронный аналог PetFriends.get_api_key."""
+
+        return await self._call(self.client.get_api_key, email, password)
+
+    async def get_list_of_pets(self, auth_key: dict, filter: str = ''):
+        """Асинхронный аналог PetFriends.get_list_of_pets."""
+
+        return await self._call(self.client.get_list_of_pets, auth_key, filter)
+
+    async def add_new_pet(self, auth_key: dict, name: str, animal_type: str,
+                          age: str, pet_photo: str):
+        """Асинхронный аналог PetFriends.add_new_pet."""
+
+        return await self._call(self.client.add_new_pet, auth_key, name, animal_type, age, pet_photo)
+
+    async def delete_pet(self, auth_key: dict, pet_id: str):
+        """Асинхронный аналог PetFriends.delete_pet."""
+
+        return await self._call(self.client.delete_pet, auth_key, pet_id)
+
+    async def update_pet_info(self, auth_key: dict, pet_id: str, name: str,
+                              animal_type: str, age: int):
+        """Асинхронный аналог PetFriends.update_pet_info."""
+
+        return await self._call(self.client.update_pet_info, auth_key, pet_id, name, animal_type, age)
+
+    async def add_new_pet_without_photo(self, auth_key: dict, name: str,
+                                        animal_type: str, age: str):
+        """Асинхронный аналог PetFriends.add_new_pet_without_photo."""
+
+        return await self._call(self.client.add_new_pet_without_photo, auth_key, name, animal_type, age)
+
+    async def add_foto_of_pet(self, auth_key: dict, pet_id: str, pet_photo: str):
+        """Асинхронный аналог PetFriends.add_foto_of_pet."""
+
+        return await self._call(self.client.add_foto_of_pet, auth_key, pet_id, pet_photo)
+
+    async def create_pets(self, auth_key: dict, pets) -> list:
+        """Добавляет питомцев конкурентно. pets - итерируемый набор словарей с ключами name,
+        animal_type, age и необязательным pet_photo. Возвращает список (status, result) в порядке
+        входных данных; исключение отдельного запроса попадает в список вместо результата."""
+
+        return await asyncio.gather(*(self._call(self.client._create_pet, auth_key, pet) for pet in pets),
+                                    return_exceptions=True)
+
+    async def delete_pets(self, auth_key: dict, pet_ids) -> list:
+        """Удаляет питомцев по списку id конкурентно. Результаты - как в create_pets."""
+
+        return await asyncio.gather(*(self.delete_pet(auth_key, pet_id) for pet_id in pet_ids),
+                                    return_exceptions=True)
+
+    async def update_pets(self, auth_key: dict, pets) -> list:
+        """Обновляет питомцев конкурентно. pets - итерируемый набор словарей с ключами id, name,
+        animal_type и age. Результаты - как в create_pets."""
+
+        return await asyncio.gather(*(self.update_pet_info(auth_key, pet['id'], pet['name'],
+                                                           pet['animal_type'], pet['age'])
+                                      for pet in pets),
+                                    return_exceptions=True)
@@ -0,0 +1,224 @@
+"""Нагрузочный прогон API Pet Friends через методы библиотеки api.
+
+Сценарии login, list, add, update и delete выполняются по очереди, каждый заданное число раз
+в пуле из concurrency потоков, при необходимости с ограничением частоты запросов. Для каждого
+сценария считаются пропускная способность и перцентили задержки, отчёт пишется в JSON.
+
+    python benchmark.py --local --requests 500 --concurrency 20 --output bench.json
+
+С --mode async запросы идут не через пул потоков групповых методов, а через AsyncPetFriends
+с тем же лимитом concurrency. С опцией --local прогон идёт против локального fake_server, что позволяет сравнивать
+накладные расходы самого клиента между версиями. Локальный сервер отвечает мгновенно, поэтому
+для проверки масштабирования по concurrency ему задаётся задержка ответа --latency в секундах:
+
+    python benchmark.py --local --latency 0.02 --scenario list --concurrency 8 --mode async
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+
+from api import BulkOutcome, PetFriends
+from async_api import AsyncPetFriends
+from fake_server import FakePetFriendsServer
+from settings import valid_email, valid_password
+from throttle import TokenBucket
+
+
+SCENARIOS = ('login', 'list', 'add', 'update', 'delete')
+MODES = ('threads', 'async')
+
+default_photo = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'images', 'cat1.jpg')
+
+
+def percentile(values: list, q: float) -> float:
+    """Перцентиль q (0-100) по методу ближайшего ранга, values должен быть отсортирован."""
+
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(latencies: list, errors: int, duration: float) -> dict:
+    """Сводка по сценарию: число запросов, ошибок, пропускная способность и задержки в мс."""
+
+    latencies = sorted(latencies)
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'duration_s': round(duration, 4),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration else 0.0,
+        'latency_ms': {
+            'mean': round(sum(ms) / len(ms), 3) if ms else 0.0,
+            'p50': round(percentile(ms, 50), 3),
+            'p95': round(percentile(ms, 95), 3),
+            'p99': round(percentile(ms, 99), 3),
+            'max': round(ms[-1], 3) if ms else 0.0,
+        },
+    }
+
+
+def _timed(operation):
+    """Оборачивает operation так, чтобы результат содержал время выполнения запроса."""
+
+    def run(item):
+        started = time.perf_counter()
+        status, result = operation(item)
+        return status, (time.perf_counter() - started, result)
+
+    return run
+
+
+def _run_async(pf: PetFriends, operation, items, concurrency: int, rate: float = None):
+    """Выполняет operation для каждого элемента items через AsyncPetFriends поверх клиента pf
+    и возвращает список BulkOutcome."""
+
+    limiter = TokenBucket(rate, burst=1) if rate else None
+    items = list(items)
+
+    def run(item):
+        if limiter is not None:
+            limiter.acquire()
+        return operation(item)
+
+    async def gather():
+        async with AsyncPetFriends(concurrency=concurrency, client=pf) as apf:
+            return await asyncio.gather(*(apf._call(run, item) for item in items), return_exceptions=True)
+
+    return [BulkOutcome(item, None, result) if isinstance(result, Exception) else BulkOutcome(item, *result)
+            for item, result in zip(items, asyncio.run(gather()))]
+
+
+def run_scenario(pf: PetFriends, operation, items, concurrency: int, rate: float = None,
+                 mode: str = 'threads') -> tuple:
+    """Выполняет operation для каждого элемента items и возвращает (сводка, результаты успешных
+    запросов). mode - 'threads' (пул потоков групповых методов) или 'async' (AsyncPetFriends)."""
+
+    latencies, results, errors = [], [], 0
+    started = time.perf_counter()
+    if mode == 'async':
+        outcomes = _run_async(pf, _timed(operation), items, concurrency, rate)
+    else:
+        outcomes = pf._run_bulk(_timed(operation), items, concurrency, rate)
+    for outcome in outcomes:
+        if outcome.status is None:
+            errors += 1
+            continue
+        latency, result = outcome.result
+        latencies.append(latency)
+        if outcome.ok:
+            results.append(result)
+        else:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - started), results
+
+
+def run_benchmark(base_url: str = None, email: str = valid_email, password: str = valid_password,
+                  scenarios=SCENARIOS, requests: int = 100, concurrency: int = 10,
+                  rate: float = None, pet_photo: str = default_photo, mode: str = 'threads') -> dict:
+    """Прогоняет сценарии против сервера base_url и возвращает отчёт в виде словаря.
+    Питомцы, созданные прогоном, удаляются в конце, даже если сценарий delete не выбран."""
+
+    report = {
+        'base_url': base_url,
+        'mode': mode,
+        'requests': requests,
+        'concurrency': concurrency,
+        'rate': rate,
+        'scenarios': {},
+    }
+
+    # кэш ключей отключён, иначе сценарий login мерил бы только обращение к кэшу
+    with PetFriends(base_url=base_url, pool_size=concurrency, key_ttl=0) as pf:
+        status, auth_key = pf.get_api_key(email, password)
+        if status != 200:
+            raise RuntimeError('login failed with status %s: %s' % (status, auth_key))
+
+        pet_ids = []
+        specs = [{'name': 'bench-%d' % i, 'animal_type': 'benchmark', 'age': '1', 'pet_photo': pet_photo}
+                 for i in range(requests)]
+
+        def add(pet):
+            status, result = pf.add_new_pet(auth_key, pet['name'], pet['animal_type'], pet['age'],
+                                            pet['pet_photo'])
+            if status == 200:
+                pet_ids.append(result['id'])
+            return status, result
+
+        operations = {
+            'login': lambda _: pf.get_api_key(email, password),
+            'list': lambda _: pf.get_list_of_pets(auth_key, 'my_pets'),
+            'add': add,
+            'update': lambda pet_id: pf.update_pet_info(auth_key, pet_id, 'bench', 'benchmark', 2),
+            'delete': lambda pet_id: pf.delete_pet(auth_key, pet_id),
+        }
+
+        try:
+            for scenario in scenarios:
+                if scenario in ('update', 'delete') and not pet_ids:
+                    # питомцы для изменения и удаления создаются заранее и в замеры не входят
+                    pet_ids.extend(outcome.result['id'] for outcome in pf.create_pets(auth_key, specs)
+                                   if outcome.ok)
+
+                if scenario == 'add':
+                    items = specs
+                elif scenario in ('update', 'delete'):
+                    items = list(pet_ids)
+                else:
+                    items = range(requests)
+
+                summary, _ = run_scenario(pf, operations[scenario], items, concurrency, rate, mode)
+                report['scenarios'][scenario] = summary
+
+                if scenario == 'delete':
+                    pet_ids.clear()
+        finally:
+            pf.delete_pets(auth_key, pet_ids).wait()
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон API Pet Friends')
+    parser.add_argument('--base-url', help='адрес сервера, по умолчанию - публичный Pet Friends')
+    parser.add_argument('--local', action='store_true', help='поднять и использовать локальный fake_server')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='задержка ответа локального fake_server в секундах (только с --local)')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='сценарий прогона, можно указать несколько раз (по умолчанию все)')
+    parser.add_argument('--requests', type=int, default=100, help='число запросов в каждом сценарии')
+    parser.add_argument('--concurrency', type=int, default=10, help='число одновременных запросов')
+    parser.add_argument('--rate', type=float, help='ограничение частоты запросов в секунду')
+    parser.add_argument('--mode', choices=MODES, default='threads',
+                        help='threads - пул потоков групповых методов, async - AsyncPetFriends')
+    parser.add_argument('--email', default=valid_email)
+    parser.add_argument('--password', default=valid_password)
+    parser.add_argument('--photo', default=default_photo, help='картинка для сценария add')
+    parser.add_argument('--output', help='файл для JSON отчёта, по умолчанию - stdout')
+    args = parser.parse_args(argv)
+
+    options = dict(email=args.email, password=args.password, scenarios=args.scenario or SCENARIOS,
+                   requests=args.requests, concurrency=args.concurrency, rate=args.rate,
+                   pet_photo=args.photo, mode=args.mode)
+
+    if args.local:
+        with FakePetFriendsServer(users={args.email: args.password}, latency=args.latency) as server:
+            report = run_benchmark(server.url, **options)
+    else:
+        report = run_benchmark(args.base_url, **options)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict
+
+from requests import ConnectionError, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from metrics import TimedHTTPAdapter
+
+
+# Заголовки с секретами не пишутся в журнал; email и пароль учитываются только хэшем,
+# чтобы при воспроизведении различать логины разных пользователей
+SECRET_HEADERS = ('auth_key', 'email', 'password', 'authorization', 'cookie')
+CREDENTIAL_HEADERS = ('email', 'password')
+RESPONSE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+# ключ из ответа api/key заменяется в журнале этой строкой, а при воспроизведении - выдуманным ключом
+REDACTED_KEY = '<redacted>'
+
+
+def _body_bytes(request) -> bytes:
+    """Читает тело запроса в байты. Потоковое тело (MultipartEncoder) вычитывается и
+    подменяется байтами, чтобы запрос всё равно можно было отправить."""
+
+    body = request.body
+    if body is None:
+        return b''
+    if hasattr(body, 'read'):
+        body = body.read()
+        request.body = body
+    if isinstance(body, str):
+        body = body.encode()
+    return body
+
+
+def request_key(request, body: bytes) -> tuple:
+    """Ключ запроса в журнале: метод, путь с параметрами, хэш тела и хэш учётных данных.
+    Граница multipart в теле заменяется постоянной, иначе хэш менялся бы на каждый запрос."""
+
+    content_type = request.headers.get('Content-Type', '')
+    if 'boundary=' in content_type:
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+        body = body.replace(boundary, b'BOUNDARY')
+
+    credentials = '\n'.join(request.headers.get(name, '') for name in CREDENTIAL_HEADERS)
+    return (request.method, request.path_url, hashlib.sha256(body).hexdigest(),
+            hashlib.sha256(credentials.encode()).hexdigest())
+
+
+def _compact_pet(pet):
+    """Фото питомца (data URI в base64) хранится в журнале только хэшем 'sha256:...'."""
+
+    if isinstance(pet, dict) and pet.get('pet_photo'):
+        pet = dict(pet, pet_photo='sha256:' + hashlib.sha256(pet['pet_photo'].encode()).hexdigest())
+    return pet
+
+
+def _compact_body(path: str, body):
+    """Тело ответа для журнала: без ключа из api/key и без фото питомцев."""
+
+    if not isinstance(body, dict):
+        return body
+    if path.split('?', 1)[0].rstrip('/').endswith('/api/key') and 'key' in body:
+        return dict(body, key=REDACTED_KEY)
+    if isinstance(body.get('pets'), list):
+        return dict(body, pets=[_compact_pet(pet) for pet in body['pets']])
+    return _compact_pet(body)
+
+
+class RecordingAdapter(TimedHTTPAdapter):
+    """Транспорт, который отправляет запросы как обычно и дописывает каждый обмен строкой JSON
+    в журнал path: метод, путь, заголовки без секретов, хэши тела и учётных данных, статус,
+    основные заголовки ответа и тело ответа (JSON или текст). Ключ из ответа api/key в журнал
+    не попадает, а фото питомцев записываются только хэшем. Как и TimedHTTPAdapter, замеряет
+    установку соединений, так что запись совместима с metrics."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self._log = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        body = _body_bytes(request)
+        response = super().send(request, **kwargs)
+
+        method, path, body_sha256, credentials_sha256 = request_key(request, body)
+        entry = {
+            'method': method,
+            'path': path,
+            'headers': {name: value for name, value in request.headers.items()
+                        if name.lower() not in SECRET_HEADERS},
+            'body_sha256': body_sha256,
+            'credentials_sha256': credentials_sha256,
+            'status': response.status_code,
+            'response_headers': {name: response.headers[name] for name in RESPONSE_HEADERS
+                                 if name in response.headers},
+        }
+        try:
+            entry['json'] = _compact_body(path, json.loads(response.content))
+        except ValueError:
+            entry['text'] = response.text
+
+        with self._lock:
+            self._log.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._log.flush()
+        return response
+
+    def close(self):
+        super().close()
+        self._log.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Транспорт, который не ходит в сеть, а отдаёт ответы из журнала RecordingAdapter.
+
+    Ответы ищутся по ключу request_key. Если один и тот же запрос записан несколько раз,
+    ответы отдаются в порядке записи, а после последнего повторяется последний. Для запроса,
+    которого нет в журнале, выбрасывается requests.ConnectionError. Вместо вырезанного при записи
+    ключа api/key отдаётся выдуманный, свой для каждого логина, а вместо фото - их хэши.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._entries = defaultdict(list)
+        self._positions = defaultdict(int)
+        self._lock = threading.Lock()
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    key = (entry['method'], entry['path'], entry['body_sha256'], entry['credentials_sha256'])
+                    self._entries[key].append(entry)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = request_key(request, _body_bytes(request))
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise ConnectionError('no recorded response for %s %s' % (request.method, request.path_url),
+                                      request=request)
+            position = self._positions[key]
+            self._positions[key] = min(position + 1, len(entries) - 1)
+            entry = entries[position]
+
+        response = Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['response_headers'])
+        if 'json' in entry:
+            body = entry['json']
+            if isinstance(body, dict) and body.get('key') == REDACTED_KEY:
+                body = dict(body, key='replayed-%s-%d' % (key[3][:16], position))
+            response._content = json.dumps(body).encode()
+        else:
+            response._content = entry['text'].encode()
+        response._content_consumed = True
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
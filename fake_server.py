@@ -0,0 +1,321 @@
+import base64
+import email.parser
+import email.policy
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakePetFriendsServer:
+    """Локальная замена сервера Pet Friends для тестов без сети.
+
+    Реализует те же эндпоинты, что использует библиотека api: /api/key, /api/pets (GET и POST),
+    /api/create_pet_simple, /api/pets/set_photo/<id>, PUT и DELETE /api/pets/<id>. Пользователи,
+    ключи и питомцы хранятся в памяти. Сервер запускается в фоновом потоке на свободном порту:
+
+        with FakePetFriendsServer(users={email: password}) as server:
+            pf = PetFriends(base_url=server.url)
+    """
+
+    def __init__(self, users: dict = None, host: str = '127.0.0.1', port: int = 0, latency: float = 0):
+        """users - словарь email -> пароль зарегистрированных пользователей;
+        port - порт для запуска, 0 - любой свободный;
+        latency - задержка перед ответом на каждый запрос в секундах, как у удалённого сервера."""
+
+        self.users = dict(users or {})
+        self.latency = latency
+        self.keys = {}
+        self.pets = {}
+        self.version = 0
+        self.requests_count = 0
+        self.lock = threading.Lock()
+        self._failures = []
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return 'http://%s:%s/' % (host, port)
+
+    def start(self) -> 'FakePetFriendsServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,),
+                                        name='fake-petfriends', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def reset(self):
+        """Удаляет всех питомцев и выданные ключи."""
+
+        with self.lock:
+            self.keys.clear()
+            self.pets.clear()
+            self.version += 1
+
+    def expire_keys(self):
+        """Делает все выданные ключи недействительными, как при их устаревании на сервере."""
+
+        with self.lock:
+            self.keys.clear()
+
+    def fail_next(self, count: int, status: int = 429, retry_after: str = None):
+        """Отвечает на следующие count запросов статусом status (по умолчанию 429 Too Many
+        Requests) с заголовком Retry-After, если он задан."""
+
+        with self.lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    def take_failure(self) -> tuple | None:
+        with self.lock:
+            return self._failures.pop(0) if self._failures else None
+
+    def issue_key(self, email: str, password: str) -> str | None:
+        with self.lock:
+            if self.users.get(email) != password:
+                return None
+            key = uuid.uuid4().hex
+            self.keys[key] = email
+            return key
+
+    def user_for(self, key: str) -> str | None:
+        return self.keys.get(key)
+
+    def create_pet(self, user: str, fields: dict, photo: tuple = None) -> dict:
+        pet = {
+            'id': uuid.uuid4().hex,
+            'name': fields.get('name', ''),
+            'animal_type': fields.get('animal_type', ''),
+            'age': fields.get('age', ''),
+            'pet_photo': _photo_uri(*photo) if photo else '',
+            'created_at': str(time.time()),
+            'user_id': user,
+        }
+        with self.lock:
+            self.pets[pet['id']] = pet
+            self.version += 1
+        return dict(pet)
+
+    def update_pet(self, user: str, pet_id: str, fields: dict = None, photo: tuple = None) -> dict | None:
+        """Обновляет питомца пользователя. Пустые поля, как и на настоящем сервере, не затирают
+        старые значения. Возвращает None, если питомца нет или он чужой."""
+
+        with self.lock:
+            pet = self.pets.get(pet_id)
+            if pet is None or pet['user_id'] != user:
+                return None
+            for field, value in (fields or {}).items():
+                if field in ('name', 'animal_type', 'age') and value:
+                    pet[field] = value
+            if photo:
+                pet['pet_photo'] = _photo_uri(*photo)
+            self.version += 1
+            return dict(pet)
+
+    def delete_pet(self, user: str, pet_id: str) -> bool:
+        with self.lock:
+            pet = self.pets.get(pet_id)
+            if pet is None or pet['user_id'] != user:
+                return False
+            del self.pets[pet_id]
+            self.version += 1
+            return True
+
+    def list_pets(self, user: str, filter: str) -> list:
+        with self.lock:
+            pets = list(self.pets.values())
+        if filter == 'my_pets':
+            pets = [pet for pet in pets if pet['user_id'] == user]
+        return pets
+
+
+def _photo_uri(content_type: str, data: bytes) -> str:
+    return 'data:%s;base64,%s' % (content_type or 'image/jpeg', base64.b64encode(data).decode())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Обработчик запросов для FakePetFriendsServer."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakePetFriends/1.0'
+    # заголовки и тело ответа пишутся отдельно, без TCP_NODELAY keep-alive запросы ждут delayed ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def fake(self) -> FakePetFriendsServer:
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self) -> bool:
+        """Считает запрос и отвечает на него ошибкой, если она заказана через fail_next.
+        Возвращает True, если ответ уже отправлен."""
+
+        with self.fake.lock:
+            self.fake.requests_count += 1
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        failure = self.fake.take_failure()
+        if failure is None:
+            return False
+        self._read_body()
+        status, retry_after = failure
+        self._reply(status, 'Too Many Requests', {'Retry-After': retry_after} if retry_after else None)
+        return True
+
+    def _route(self) -> tuple:
+        url = urlsplit(self.path)
+        path = re.sub('/+', '/', url.path).rstrip('/')
+        return path, parse_qs(url.query)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, status: int, body=None, headers: dict = None):
+        if isinstance(body, (dict, list)):
+            payload = json.dumps(body).encode()
+            content_type = 'application/json'
+        else:
+            payload = (body or '').encode()
+            content_type = 'text/html; charset=utf-8'
+
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload) if status != 304 else 0))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(payload)
+
+    def _forbidden(self):
+        self._reply(403, '<h1>Forbidden</h1><p>Please provide \'auth_key\' Header</p>')
+
+    def _user(self) -> str | None:
+        return self.fake.user_for(self.headers.get('auth_key', ''))
+
+    def _form(self, body: bytes) -> tuple:
+        """Разбирает тело формы. Возвращает (поля, фото), фото - (content-type, байты) или None."""
+
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+            fields, photo = {}, None
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                data = part.get_payload(decode=True)
+                if part.get_filename() is not None:
+                    photo = (part.get_content_type(), data)
+                else:
+                    fields[name] = data.decode()
+            return fields, photo
+
+        fields = {name: values[0] for name, values in parse_qs(body.decode(), keep_blank_values=True).items()}
+        return fields, None
+
+    def do_GET(self):
+        if self._count():
+            return
+        path, query = self._route()
+
+        if path == '/api/key':
+            key = self.fake.issue_key(self.headers.get('email'), self.headers.get('password'))
+            if key is None:
+                return self._reply(403, "<h1>Forbidden</h1><p>This user wasn't found in database</p>")
+            return self._reply(200, {'key': key})
+
+        if path == '/api/pets':
+            user = self._user()
+            if user is None:
+                return self._forbidden()
+            filter = query.get('filter', [''])[0]
+            etag = '"%s"' % self.fake.version
+            if self.headers.get('If-None-Match') == etag:
+                return self._reply(304, headers={'ETag': etag})
+            return self._reply(200, {'pets': self.fake.list_pets(user, filter)}, {'ETag': etag})
+
+        self._reply(404, 'Not Found')
+
+    def do_POST(self):
+        if self._count():
+            return
+        path, _ = self._route()
+        body = self._read_body()
+        user = self._user()
+        if user is None:
+            return self._forbidden()
+        fields, photo = self._form(body)
+
+        if path == '/api/pets':
+            if photo is None:
+                return self._reply(400, 'Bad Request')
+            return self._reply(200, self.fake.create_pet(user, fields, photo))
+
+        if path == '/api/create_pet_simple':
+            return self._reply(200, self.fake.create_pet(user, fields))
+
+        if path.startswith('/api/pets/set_photo/'):
+            pet_id = path.rsplit('/', 1)[1]
+            if photo is None:
+                return self._reply(400, 'Bad Request')
+            pet = self.fake.update_pet(user, pet_id, photo=photo)
+            if pet is None:
+                return self._reply(500, 'Internal Server Error')
+            return self._reply(200, pet)
+
+        self._reply(404, 'Not Found')
+
+    def do_PUT(self):
+        if self._count():
+            return
+        path, _ = self._route()
+        body = self._read_body()
+        user = self._user()
+        if user is None:
+            return self._forbidden()
+
+        if path.startswith('/api/pets/'):
+            fields, _ = self._form(body)
+            pet = self.fake.update_pet(user, path.rsplit('/', 1)[1], fields)
+            if pet is None:
+                return self._reply(400, 'Bad Request')
+            return self._reply(200, pet)
+
+        self._reply(404, 'Not Found')
+
+    def do_DELETE(self):
+        if self._count():
+            return
+        path, _ = self._route()
+        self._read_body()
+        user = self._user()
+        if user is None:
+            return self._forbidden()
+
+        if path.startswith('/api/pets/'):
+            # настоящий сервер отвечает на удаление пустым телом, даже если питомца нет
+            self.fake.delete_pet(user, path.rsplit('/', 1)[1])
+            return self._reply(200)
+
+        self._reply(404, 'Not Found')
@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+from collections import defaultdict
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+PHASES = ('connect', 'wait', 'download', 'encode', 'decode')
+
+# время установки соединений (DNS, TCP, TLS) в текущем потоке во время текущего запроса
+_connect_timing = threading.local()
+
+
+class RequestEvent:
+    """Замеры одного вызова метода PetFriends.
+
+    endpoint - путь без id (например 'api/pets/{id}'), phases - длительности фаз в секундах:
+    connect - установка новых соединений (DNS, TCP, TLS), wait - от отправки запроса до
+    заголовков ответа, download - загрузка тела ответа, encode - сборка тела запроса,
+    decode - разбор JSON. retries - число повторов (сетевые ошибки, 5xx и повторный логин).
+    """
+
+    __slots__ = ('endpoint', 'method', 'status', 'started_at', 'total', 'phases',
+                 'bytes_sent', 'bytes_received', 'retries')
+
+    def __init__(self, endpoint: str, method: str):
+        self.endpoint = endpoint
+        self.method = method
+        self.status = None
+        self.started_at = time.time()
+        self.total = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class MetricsCollector:
+    """Сборщик метрик запросов PetFriends, подключается параметром PetFriends(metrics=...).
+
+    Копит по каждому эндпоинту число запросов по статусам, суммы фаз, байты и повторы.
+    Итог можно получить словарём (snapshot), текстом в формате Prometheus (to_prometheus) или
+    писать каждое событие строкой JSON в файл trace_path.
+    """
+
+    def __init__(self, trace_path: str = None):
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+        self._requests = defaultdict(int)
+        self._phases = defaultdict(float)
+        self._totals = defaultdict(float)
+        self._bytes_sent = defaultdict(int)
+        self._bytes_received = defaultdict(int)
+        self._retries = defaultdict(int)
+
+    def record(self, event: RequestEvent):
+        key = (event.endpoint, event.method)
+        with self._lock:
+            self._requests[key + (event.status,)] += 1
+            self._totals[key] += event.total
+            for phase, seconds in event.phases.items():
+                self._phases[key + (phase,)] += seconds
+            self._bytes_sent[key] += event.bytes_sent
+            self._bytes_received[key] += event.bytes_received
+            self._retries[key] += event.retries
+            if self._trace is not None:
+                self._trace.write(json.dumps(event.to_dict()) + '\n')
+
+    def close(self):
+        if self._trace is not None:
+            self._trace.close()
+
+    def snapshot(self) -> dict:
+        """Сводка по эндпоинтам: {'GET api/pets': {'requests': {200: 3}, 'seconds': ..., ...}}."""
+
+        result = {}
+        with self._lock:
+            for (endpoint, method, status), count in self._requests.items():
+                entry = result.setdefault('%s %s' % (method, endpoint), {
+                    'requests': {},
+                    'seconds': self._totals[(endpoint, method)],
+                    'phases': {phase: self._phases[(endpoint, method, phase)] for phase in PHASES},
+                    'bytes_sent': self._bytes_sent[(endpoint, method)],
+                    'bytes_received': self._bytes_received[(endpoint, method)],
+                    'retries': self._retries[(endpoint, method)],
+                })
+                entry['requests'][status] = count
+        return result
+
+    def to_prometheus(self) -> str:
+        """Текущие значения в текстовом формате экспозиции Prometheus."""
+
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in samples:
+                label_text = ','.join('%s="%s"' % item for item in labels)
+                lines.append('%s{%s} %s' % (name, label_text, value))
+
+        with self._lock:
+            family('petfriends_requests_total', 'counter', 'Requests by endpoint and status.',
+                   [((('endpoint', e), ('method', m), ('status', s)), n)
+                    for (e, m, s), n in sorted(self._requests.items(), key=str)])
+            family('petfriends_request_seconds_total', 'counter', 'Total time spent in requests.',
+                   [((('endpoint', e), ('method', m)), v) for (e, m), v in sorted(self._totals.items())])
+            family('petfriends_phase_seconds_total', 'counter', 'Time spent per request phase.',
+                   [((('endpoint', e), ('method', m), ('phase', p)), v)
+                    for (e, m, p), v in sorted(self._phases.items())])
+            family('petfriends_sent_bytes_total', 'counter', 'Request body bytes sent.',
+                   [((('endpoint', e), ('method', m)), v) for (e, m), v in sorted(self._bytes_sent.items())])
+            family('petfriends_received_bytes_total', 'counter', 'Response body bytes received.',
+                   [((('endpoint', e), ('method', m)), v)
+                    for (e, m), v in sorted(self._bytes_received.items())])
+            family('petfriends_retries_total', 'counter', 'Retried attempts.',
+                   [((('endpoint', e), ('method', m)), v) for (e, m), v in sorted(self._retries.items())])
+        return '\n'.join(lines) + '\n'
+
+
+def reset_connect_timing():
+    _connect_timing.seconds = 0.0
+
+
+def connect_timing() -> float:
+    return getattr(_connect_timing, 'seconds', 0.0)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.seconds = connect_timing() + time.perf_counter() - started
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.seconds = connect_timing() + time.perf_counter() - started
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, который замеряет время установки новых соединений для RequestEvent."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
@@ -0,0 +1,117 @@
+import base64
+from collections.abc import Sequence
+
+
+def decode_pet_photo(pet_photo: str) -> bytes:
+    """Декодирует поле pet_photo из ответа сервера (data URI вида 'data:image/jpeg;base64,...')
+    в байты картинки. Для питомца без фото возвращает пустые байты."""
+
+    if not pet_photo:
+        return b''
+    return base64.b64decode(pet_photo.partition(',')[2])
+
+
+class Pet:
+    """Компактная запись о питомце вместо словаря из JSON ответа.
+
+    Атрибуты хранятся в __slots__, поэтому запись занимает заметно меньше памяти, чем dict.
+    Фото хранится так же, как пришло от сервера (строка base64 в поле pet_photo), и декодируется
+    в байты только при обращении к свойству photo. Для совместимости с кодом, работающим со
+    словарями, поддерживается доступ по ключу: pet['id'], pet['name'] и т.д.
+    """
+
+    FIELDS = ('id', 'name', 'animal_type', 'age', 'pet_photo', 'created_at', 'user_id')
+
+    __slots__ = FIELDS
+
+    def __init__(self, id: str, name: str = '', animal_type: str = '', age: str = '',
+                 pet_photo: str = '', created_at: str = '', user_id: str = ''):
+        self.id = id
+        self.name = name
+        self.animal_type = animal_type
+        self.age = age
+        self.pet_photo = pet_photo
+        self.created_at = created_at
+        self.user_id = user_id
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Pet':
+        """Создаёт запись из словаря ответа сервера, лишние поля отбрасываются."""
+
+        return cls(**{field: data[field] for field in cls.FIELDS if field in data})
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @property
+    def photo(self) -> bytes:
+        """Байты картинки, декодированные из pet_photo; пустые, если фото нет."""
+
+        return decode_pet_photo(self.pet_photo)
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Pet):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    def __repr__(self) -> str:
+        return 'Pet(id=%r, name=%r, animal_type=%r, age=%r)' % (self.id, self.name, self.animal_type, self.age)
+
+
+class PetList(Sequence):
+    """Список питомцев с индексом по id.
+
+    Ведёт себя как обычный список Pet, а проверка pet_id in pets и поиск pets.by_id(pet_id)
+    выполняются за O(1) без перебора всего списка.
+    """
+
+    __slots__ = ('_pets', '_index')
+
+    def __init__(self, pets=()):
+        self._pets = list(pets)
+        self._index = {pet.id: pet for pet in self._pets}
+
+    @classmethod
+    def from_dicts(cls, items) -> 'PetList':
+        return cls(Pet.from_dict(item) for item in items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PetList(self._pets[index])
+        return self._pets[index]
+
+    def __len__(self) -> int:
+        return len(self._pets)
+
+    def __iter__(self):
+        return iter(self._pets)
+
+    def __contains__(self, item) -> bool:
+        """Принимает как Pet, так и id питомца."""
+
+        if isinstance(item, Pet):
+            return self._index.get(item.id) == item
+        return item in self._index
+
+    def by_id(self, pet_id: str) -> Pet | None:
+        return self._index.get(pet_id)
+
+    @property
+    def ids(self):
+        """Множество-представление id всех питомцев списка."""
+
+        return self._index.keys()
+
+    def __repr__(self) -> str:
+        return 'PetList(%r)' % self._pets
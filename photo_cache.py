@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# Сигнатуры поддерживаемых форматов: начало файла -> (content-type, формат Pillow)
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'PNG'),
+    (b'GIF87a', 'image/gif', 'GIF'),
+    (b'GIF89a', 'image/gif', 'GIF'),
+)
+
+
+class CachedPhoto(namedtuple('CachedPhoto', 'digest filename content_type data')):
+    """Подготовленное к отправке фото: sha256 исходного содержимого, имя файла, content-type
+    и байты (после уменьшения, если оно включено)."""
+
+    __slots__ = ()
+
+
+def sniff_image(data: bytes) -> tuple:
+    """Определяет формат изображения по сигнатуре. Возвращает (content-type, формат Pillow)
+    либо выбрасывает ValueError, если данные не похожи на JPEG, PNG, GIF или WEBP."""
+
+    for signature, content_type, image_format in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type, image_format
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp', 'WEBP'
+    raise ValueError('unsupported image format')
+
+
+class PhotoCache:
+    """Кэш фото питомцев для повторной загрузки одних и тех же файлов.
+
+    Файл читается с диска и проверяется один раз, дальше до изменения файла (ключ - путь, mtime
+    и размер) фото отдаётся из памяти. Содержимое хранится по sha256, поэтому одинаковые
+    картинки под разными путями занимают память один раз. Общий объём ограничен max_bytes,
+    при переполнении вытесняются давно не использованные фото.
+
+    Если задан max_size=(ширина, высота), картинки крупнее этого размера уменьшаются и
+    перекодируются перед отправкой (нужен Pillow):
+
+        pf = PetFriends(photo_cache=PhotoCache(max_size=(800, 800)))
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_size: tuple = None, quality: int = 85):
+        if max_size is not None and Image is None:
+            raise ImportError('Pillow is required to downscale photos (pip install Pillow)')
+
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.quality = quality
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._paths = {}
+        self._photos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._photos)
+
+    def get(self, path: str | os.PathLike) -> CachedPhoto:
+        """Возвращает подготовленное фото для файла path, читая его с диска только при промахе.
+        Имя файла в результате всегда берётся из path, даже если содержимое в кэше общее с
+        другим путём."""
+
+        stat = os.stat(path)
+        path_key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+        filename = os.path.basename(path)
+
+        with self._lock:
+            photo = self._photos.get(self._paths.get(path_key))
+            if photo is not None:
+                self._photos.move_to_end(photo.digest)
+                self.hits += 1
+                return photo if photo.filename == filename else photo._replace(filename=filename)
+            self.misses += 1
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        photo = self._prepare(filename, data)
+
+        with self._lock:
+            self._store(photo)
+            if photo.digest in self._photos:
+                self._paths[path_key] = photo.digest
+        return photo
+
+    def clear(self):
+        with self._lock:
+            self._paths.clear()
+            self._photos.clear()
+            self.size_bytes = 0
+
+    def _prepare(self, filename: str, data: bytes) -> CachedPhoto:
+        """Проверяет формат и при необходимости уменьшает картинку."""
+
+        digest = hashlib.sha256(data).hexdigest()
+        content_type, image_format = sniff_image(data)
+
+        if self.max_size is not None:
+            with Image.open(io.BytesIO(data)) as image:
+                if image.width > self.max_size[0] or image.height > self.max_size[1]:
+                    image.thumbnail(self.max_size)
+                    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                        image = image.convert('RGB')
+                    buffer = io.BytesIO()
+                    image.save(buffer, format=image_format, quality=self.quality, optimize=True)
+                    data = buffer.getvalue()
+
+        return CachedPhoto(digest, filename, content_type, data)
+
+    def _store(self, photo: CachedPhoto):
+        """Кладёт фото в кэш и вытесняет старые записи сверх max_bytes. Вызывается под _lock."""
+
+        if len(photo.data) > self.max_bytes:
+            return
+        if photo.digest in self._photos:
+            self._photos.move_to_end(photo.digest)
+            return
+
+        self._photos[photo.digest] = photo
+        self.size_bytes += len(photo.data)
+
+        while self.size_bytes > self.max_bytes:
+            digest, evicted = self._photos.popitem(last=False)
+            self.size_bytes -= len(evicted.data)
+            for path_key in [k for k, d in self._paths.items() if d == digest]:
+                del self._paths[path_key]
@@ -0,0 +1,177 @@
+import hashlib
+import os
+from collections import namedtuple
+
+from models import decode_pet_photo
+
+
+# Шаги операции синхронизации одного питомца, выполняются по порядку
+STEPS = ('create', 'update', 'set_photo', 'delete')
+
+# Поля питомца, которые задаёт вызывающий код и которые меняет update_pet_info
+FIELDS = ('name', 'animal_type', 'age')
+
+
+class SyncOperation(namedtuple('SyncOperation', 'steps pet_id pet')):
+    """Операция над одним питомцем: шаги из STEPS, id питомца на сервере (None для создания)
+    и желаемое описание питомца (None для удаления). Каждый шаг - один запрос к серверу."""
+
+    __slots__ = ()
+
+
+class SyncPlan:
+    """Разница между питомцами на сервере и желаемым набором.
+
+    operations - операции, которые приводят my_pets к желаемому состоянию, unchanged - id
+    питомцев, которые уже совпадают с желаемыми и не трогаются. len(plan) - число запросов,
+    которые потребуются для выполнения плана.
+    """
+
+    def __init__(self, operations: list, unchanged: list):
+        self.operations = operations
+        self.unchanged = unchanged
+
+    def count(self, step: str) -> int:
+        """Число операций с шагом step."""
+
+        return sum(step in operation.steps for operation in self.operations)
+
+    def __len__(self) -> int:
+        return sum(len(operation.steps) for operation in self.operations)
+
+    def __repr__(self):
+        counts = ', '.join('%s=%d' % (step, self.count(step)) for step in STEPS)
+        return 'SyncPlan(%s, unchanged=%d)' % (counts, len(self.unchanged))
+
+
+def photo_digest(data: bytes) -> str:
+    """sha256 байт картинки; для питомца без фото - пустая строка."""
+
+    return hashlib.sha256(data).hexdigest() if data else ''
+
+
+def desired_photo(pet_photo, cache=None) -> tuple:
+    """Приводит фото желаемого питомца к паре (значение для загрузки, sha256 байт).
+
+    pet_photo может быть путём к файлу, байтами, буфером, открытым бинарным файлом или строкой
+    data URI из ответа сервера (так снимок my_pets можно загрузить обратно). Файловый объект
+    вычитывается один раз, и дальше загружаются прочитанные байты. Если передан cache
+    (photo_cache.PhotoCache), хэш считается по байтам из кэша, то есть уже уменьшенным.
+    """
+
+    if not pet_photo:
+        return None, ''
+    if isinstance(pet_photo, str) and pet_photo.startswith('data:'):
+        pet_photo = decode_pet_photo(pet_photo)
+    elif isinstance(pet_photo, (str, os.PathLike)):
+        if cache is not None:
+            return pet_photo, photo_digest(cache.get(pet_photo).data)
+        with open(pet_photo, 'rb') as f:
+            return pet_photo, photo_digest(f.read())
+    elif hasattr(pet_photo, 'read'):
+        pet_photo = pet_photo.read()
+    return pet_photo, photo_digest(bytes(pet_photo))
+
+
+def _fields(pet) -> tuple:
+    return tuple('' if pet.get(field) is None else str(pet.get(field)) for field in FIELDS)
+
+
+def content_hash(fields: tuple, photo: str) -> str:
+    """Хэш содержимого питомца: имя, вид, возраст и sha256 фото. id и служебные поля
+    сервера (created_at, user_id) в хэш не входят."""
+
+    return hashlib.sha256('\0'.join(fields + (photo,)).encode()).hexdigest()
+
+
+class _Entry:
+    """Питомец при сравнении: поля, хэш фото и хэш содержимого."""
+
+    __slots__ = ('pet_id', 'pet', 'fields', 'photo', 'digest')
+
+    def __init__(self, pet_id, pet, fields: tuple, photo: str):
+        self.pet_id = pet_id
+        self.pet = pet
+        self.fields = fields
+        self.photo = photo
+        self.digest = content_hash(fields, photo)
+
+
+def _update_steps(current: _Entry, wanted: _Entry) -> tuple | None:
+    """Шаги, превращающие current в wanted, либо None, если это невозможно без пересоздания:
+    сервер не затирает поля пустыми значениями и не умеет удалять фото."""
+
+    steps = ()
+    if current.fields != wanted.fields:
+        if not all(wanted.fields):
+            return None
+        steps += ('update',)
+    if current.photo != wanted.photo:
+        if not wanted.photo:
+            return None
+        steps += ('set_photo',)
+    return steps
+
+
+def plan_sync(current, desired, cache=None) -> SyncPlan:
+    """Строит минимальный план, превращающий список current (питомцы из my_pets) в desired.
+
+    desired - итерируемый набор словарей (или записей models.Pet) с ключами name, animal_type,
+    age и необязательными pet_photo и id. Питомец с id сопоставляется с питомцем сервера по id;
+    питомцы без id - по хэшу содержимого, так что совпадающие питомцы не трогаются. Оставшийся
+    питомец, совпадающий с желаемым по полям или по фото, изменяется одним запросом (set_photo
+    или update) вместо удаления и создания. Лишние питомцы сервера удаляются.
+    """
+
+    by_id = {}
+    by_digest = {}
+    for pet in current:
+        entry = _Entry(pet['id'], pet, _fields(pet), photo_digest(decode_pet_photo(pet.get('pet_photo'))))
+        by_id[entry.pet_id] = entry
+        by_digest.setdefault(entry.digest, []).append(entry)
+
+    operations, unchanged, pairs, wanted_left = [], [], [], []
+
+    def take(entry: _Entry):
+        del by_id[entry.pet_id]
+        by_digest[entry.digest].remove(entry)
+
+    # питомцы с id сопоставляются первыми, чтобы их не занял совпадающий по содержимому
+    for source in sorted(desired, key=lambda source: source.get('id') not in by_id):
+        upload, photo = desired_photo(source.get('pet_photo'), cache)
+        pet = dict({field: source.get(field) for field in FIELDS}, pet_photo=upload)
+        wanted = _Entry(source.get('id'), pet, _fields(pet), photo)
+        if wanted.pet_id in by_id:
+            pairs.append((by_id[wanted.pet_id], wanted))
+            take(by_id[wanted.pet_id])
+        elif by_digest.get(wanted.digest):
+            entry = by_digest[wanted.digest][0]
+            unchanged.append(entry.pet_id)
+            take(entry)
+        else:
+            wanted_left.append(wanted)
+
+    # изменение выгоднее пересоздания, только если хватит одного запроса: совпадают поля или фото
+    current_left = list(by_id.values())
+    for same in (lambda a, b: a.fields == b.fields, lambda a, b: a.photo == b.photo):
+        for wanted in list(wanted_left):
+            for entry in current_left:
+                if same(entry, wanted) and _update_steps(entry, wanted) is not None:
+                    pairs.append((entry, wanted))
+                    current_left.remove(entry)
+                    wanted_left.remove(wanted)
+                    break
+
+    for entry, wanted in pairs:
+        steps = _update_steps(entry, wanted)
+        if steps is None:
+            current_left.append(entry)
+            wanted_left.append(wanted)
+        elif steps:
+            operations.append(SyncOperation(steps, entry.pet_id, wanted.pet))
+        else:
+            unchanged.append(entry.pet_id)
+
+    operations.extend(SyncOperation(('delete',), entry.pet_id, None) for entry in current_left)
+    operations.extend(SyncOperation(('create',), None, wanted.pet) for wanted in wanted_left)
+    return SyncPlan(operations, unchanged)
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from api import PetFriends
+from fake_server import FakePetFriendsServer
+from settings import valid_email, valid_password
+
+
+def pytest_addoption(parser):
+    parser.addoption('--offline', action='store_true',
+                     help='запускать тесты против локального fake_server вместо petfriends1.herokuapp.com')
+
+
+def pytest_configure(config):
+    """С опцией --offline (или переменной окружения PETFRIENDS_OFFLINE=1) поднимаем локальный
+    сервер Pet Friends и направляем на него тесты через PETFRIENDS_BASE_URL. При запуске через
+    pytest-xdist сервер поднимает только главный процесс, воркеры получают его адрес из окружения."""
+
+    if not (config.getoption('--offline') or os.environ.get('PETFRIENDS_OFFLINE')):
+        return
+    if hasattr(config, 'workerinput') and os.environ.get('PETFRIENDS_BASE_URL'):
+        return
+
+    server = FakePetFriendsServer(users={valid_email: valid_password}).start()
+    # в общей ленте настоящего сервера всегда есть чужие питомцы
+    server.create_pet('owner@petfriends.local', {'name': 'Бобик', 'animal_type': 'пёс', 'age': '4'})
+    config.fake_petfriends_server = server
+    os.environ['PETFRIENDS_BASE_URL'] = server.url
+
+
+def pytest_unconfigure(config):
+    server = getattr(config, 'fake_petfriends_server', None)
+    if server is not None:
+        server.stop()
+        del os.environ['PETFRIENDS_BASE_URL']
+
+
+@pytest.fixture(scope='session')
+def pf():
+    """Клиент API, общий для всех тестов процесса (воркера)"""
+
+    with PetFriends(base_url=os.environ.get('PETFRIENDS_BASE_URL')) as client:
+        yield client
+
+
+@pytest.fixture(scope='session')
+def auth_key(pf):
+    """Ключ api, полученный один раз на процесс (воркер)"""
+
+    status, key = pf.get_api_key(valid_email, valid_password)
+    assert status == 200, key
+    return key
+
+
+@pytest.fixture(scope='session')
+def created_pet_ids(pf, auth_key):
+    """Список id питомцев, созданных тестами этого процесса (воркера). После всех тестов
+    питомцы удаляются одним групповым запросом"""
+
+    pet_ids = []
+    yield pet_ids
+    failed = [outcome.item for outcome in pf.delete_pets(auth_key, pet_ids) if not outcome.ok]
+    assert not failed, 'не удалось удалить питомцев: %s' % failed
+
+
+@pytest.fixture()
+def my_pet(pf, auth_key, created_pet_ids):
+    """Собственный питомец теста: создаётся перед тестом, поэтому параллельные тесты
+    не меняют питомцев друг друга"""
+
+    status, pet = pf.add_new_pet_without_photo(auth_key, 'Котярыч', 'Котяра', '2')
+    assert status == 200, pet
+    created_pet_ids.append(pet['id'])
+    return pet
+
+
+@pytest.fixture()
+def fake_server():
+    """Отдельный локальный сервер для тестов возможностей клиента, всегда без сети"""
+
+    with FakePetFriendsServer(users={valid_email: valid_password}) as server:
+        yield server
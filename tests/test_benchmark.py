@@ -0,0 +1,40 @@
+from benchmark import SCENARIOS, percentile, run_benchmark
+from settings import valid_email, valid_password
+
+
+def test_percentile_nearest_rank():
+    """Проверяем расчёт перцентилей по методу ближайшего ранга"""
+
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_benchmark_against_fake_server(fake_server):
+    """Проверяем, что прогон всех сценариев против локального сервера даёт отчёт без ошибок
+    и не оставляет после себя питомцев"""
+
+    report = run_benchmark(fake_server.url, valid_email, valid_password, requests=10, concurrency=4)
+
+    assert list(report['scenarios']) == list(SCENARIOS)
+    for summary in report['scenarios'].values():
+        assert summary['requests'] == 10
+        assert summary['errors'] == 0
+        assert summary['latency_ms']['p50'] <= summary['latency_ms']['p99']
+    assert fake_server.pets == {}
+
+
+def test_benchmark_async_mode(fake_server):
+    """Проверяем прогон сценариев через асинхронный клиент"""
+
+    report = run_benchmark(fake_server.url, valid_email, valid_password, scenarios=('list', 'add', 'delete'),
+                           requests=10, concurrency=4, mode='async')
+
+    assert report['mode'] == 'async'
+    for summary in report['scenarios'].values():
+        assert summary['requests'] == 10
+        assert summary['errors'] == 0
+    assert fake_server.pets == {}
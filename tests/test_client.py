@@ -0,0 +1,431 @@
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+import requests
+
+from api import PetFriends, _iter_json_array
+from async_api import AsyncPetFriends
+from fake_server import FakePetFriendsServer
+from metrics import MetricsCollector
+from models import decode_pet_photo
+from photo_cache import PhotoCache
+from settings import valid_email, valid_password
+
+
+cat_photo = os.path.join(os.path.dirname(__file__), 'images/cat1.jpg')
+
+
+def test_api_key_is_cached(fake_server):
+    """Проверяем, что повторный запрос ключа отдаётся из кэша без обращения к серверу"""
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, first = pf.get_api_key(valid_email, valid_password)
+        status, second = pf.get_api_key(valid_email, valid_password)
+
+    assert status == 200
+    assert first == second
+    assert fake_server.requests_count == 1
+
+
+def test_expired_key_is_renewed(fake_server):
+    """Проверяем, что при ответе 403 на устаревший ключ клиент логинится заново и повторяет запрос"""
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        old_key = auth_key['key']
+        fake_server.expire_keys()
+
+        status, result = pf.get_list_of_pets(auth_key, 'my_pets')
+
+    assert status == 200
+    assert result == {'pets': []}
+    assert auth_key['key'] != old_key
+
+
+def test_expired_key_is_renewed_once_for_concurrent_requests(fake_server):
+    """Проверяем, что при одновременных запросах с устаревшим ключом клиент логинится заново
+    один раз и ни один запрос не получает 403"""
+
+    pets = [{'name': 'Пёс %d' % i, 'animal_type': 'собака', 'age': str(i)} for i in range(20)]
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        fake_server.expire_keys()
+        listed = list(pf._run_bulk(lambda _: pf.get_list_of_pets(auth_key, 'my_pets'), range(10), workers=10))
+        logins_after_list = len(fake_server.keys)
+
+        fake_server.expire_keys()
+        created = list(pf.create_pets(auth_key, pets, workers=10))
+
+    assert [outcome.status for outcome in listed] == [200] * 10
+    assert logins_after_list == 1
+    assert [outcome.status for outcome in created] == [200] * 20
+    assert len(fake_server.keys) == 1
+
+
+def test_add_new_pet_with_photo_bytes(fake_server):
+    """Проверяем добавление питомца с фото, переданным байтами, и через кэш фото"""
+
+    with open(cat_photo, 'rb') as f:
+        photo = f.read()
+
+    with PetFriends(base_url=fake_server.url, photo_cache=PhotoCache()) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        status, from_bytes = pf.add_new_pet(auth_key, 'Барсик', 'кот', '2', memoryview(photo))
+        _, from_cache = pf.add_new_pet(auth_key, 'Мурзик', 'кот', '3', cat_photo)
+
+    assert status == 200
+    assert from_bytes['pet_photo'] == from_cache['pet_photo']
+    assert from_bytes['pet_photo'].startswith('data:image/jpeg;base64,')
+
+
+def test_add_new_pet_from_bytesio_position(fake_server):
+    """Проверяем, что из BytesIO загружается только часть от текущей позиции, а сам буфер
+    после загрузки снова можно изменять"""
+
+    with open(cat_photo, 'rb') as f:
+        photo = f.read()
+    stream = io.BytesIO(b'prefix' + photo)
+    stream.seek(6)
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        status, pet = pf.add_new_pet(auth_key, 'Барсик', 'кот', '2', stream)
+
+    assert status == 200
+    assert decode_pet_photo(pet['pet_photo']) == photo
+    stream.write(b'more')
+
+
+class _ReadOnlyStream:
+    """Файловый объект, который умеет только read(), как сокет или канал"""
+
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+
+def test_add_new_pet_from_non_seekable_stream_is_resent(fake_server):
+    """Проверяем, что фото из потока без перемотки целиком отправляется и при повторе запроса
+    после устаревания ключа, и после ответа 429"""
+
+    with open(cat_photo, 'rb') as f:
+        photo = f.read()
+
+    with PetFriends(base_url=fake_server.url, backoff_factor=0) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        fake_server.expire_keys()
+        status, renewed = pf.add_new_pet(auth_key, 'Барсик', 'кот', '2', _ReadOnlyStream(photo))
+        fake_server.fail_next(1)
+        _, retried = pf.add_new_pet(auth_key, 'Мурзик', 'кот', '3', _ReadOnlyStream(photo))
+
+    assert status == 200
+    assert decode_pet_photo(renewed['pet_photo']) == photo
+    assert decode_pet_photo(retried['pet_photo']) == photo
+
+
+def test_bulk_create_and_delete_pets(fake_server):
+    """Проверяем групповое добавление и удаление питомцев"""
+
+    pets = [{'name': 'Пёс %d' % i, 'animal_type': 'собака', 'age': str(i)} for i in range(20)]
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        created = list(pf.create_pets(auth_key, pets, workers=5))
+        deleted = list(pf.delete_pets(auth_key, [outcome.result['id'] for outcome in created]))
+        _, my_pets = pf.get_list_of_pets(auth_key, 'my_pets')
+
+    assert all(outcome.ok for outcome in created + deleted)
+    assert sorted(outcome.result['name'] for outcome in created) == sorted(pet['name'] for pet in pets)
+    assert my_pets['pets'] == []
+
+
+def test_bulk_runs_without_reading_results(fake_server):
+    """Проверяем, что групповой метод выполняется, даже если его результат не читают"""
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        pet_ids = [pf.add_new_pet_without_photo(auth_key, 'Кот', 'кот', '1')[1]['id'] for _ in range(3)]
+        pf.delete_pets(auth_key, pet_ids)
+    remaining = fake_server.list_pets(valid_email, 'my_pets')
+
+    assert remaining == []
+
+
+def test_bulk_takes_items_lazily():
+    """Проверяем, что элементы берутся из генератора не больше чем на 2*workers запросов вперёд"""
+
+    taken = []
+    release = threading.Event()
+
+    def items():
+        for i in range(1000):
+            taken.append(i)
+            yield i
+
+    def operation(item):
+        release.wait()
+        return 200, item
+
+    with PetFriends(base_url='http://127.0.0.1:9/') as pf:
+        run = pf._run_bulk(operation, items(), workers=2)
+        time.sleep(0.1)
+        in_flight = len(taken)
+        release.set()
+        outcomes = run.wait()
+
+    assert in_flight <= 5
+    assert sorted(outcome.result for outcome in outcomes) == list(range(1000))
+
+
+def test_async_client_creates_pets(fake_server):
+    """Проверяем добавление питомцев через асинхронный клиент"""
+
+    async def create():
+        async with AsyncPetFriends(concurrency=4, base_url=fake_server.url) as apf:
+            _, auth_key = await apf.get_api_key(valid_email, valid_password)
+            return await apf.create_pets(auth_key, [{'name': 'Кот', 'animal_type': 'кот', 'age': '1'}] * 8)
+
+    results = asyncio.run(create())
+
+    assert [status for status, _ in results] == [200] * 8
+
+
+def test_async_client_scales_up_to_concurrency():
+    """Проверяем, что на сервере с задержкой ответа пропускная способность асинхронного клиента
+    растёт почти пропорционально concurrency (размер пула соединений равен concurrency)"""
+
+    requests_count = 16
+
+    async def throughput(server, concurrency: int) -> float:
+        async with AsyncPetFriends(concurrency=concurrency, base_url=server.url) as apf:
+            _, auth_key = await apf.get_api_key(valid_email, valid_password)
+            started = time.monotonic()
+            results = await asyncio.gather(*(apf.get_list_of_pets(auth_key, 'my_pets')
+                                             for _ in range(requests_count)))
+            elapsed = time.monotonic() - started
+        assert [status for status, _ in results] == [200] * requests_count
+        return requests_count / elapsed
+
+    with FakePetFriendsServer(users={valid_email: valid_password}, latency=0.05) as server:
+        rps = {concurrency: asyncio.run(throughput(server, concurrency)) for concurrency in (1, 2, 4, 8)}
+
+    for concurrency in (2, 4, 8):
+        assert 0.6 * concurrency <= rps[concurrency] / rps[1] <= 1.1 * concurrency
+
+
+def test_iter_pets_streams_without_photos(fake_server):
+    """Проверяем потоковое получение списка питомцев без поля фото"""
+
+    with PetFriends(base_url=fake_server.url, typed=True) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        _, pet = pf.add_new_pet(auth_key, 'Барсик', 'кот', '2', cat_photo)
+        pets = list(pf.iter_pets(auth_key, 'my_pets'))
+        _, my_pets = pf.get_list_of_pets(auth_key, 'my_pets')
+
+    assert [p.id for p in pets] == [pet.id]
+    assert pets[0].pet_photo == ''
+    assert pet.id in my_pets
+    assert my_pets.by_id(pet.id).photo == open(cat_photo, 'rb').read()
+
+
+def test_iter_pets_with_invalid_key(fake_server):
+    """Проверяем, что iter_pets с неверным ключом выбрасывает HTTPError"""
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        with pytest.raises(requests.HTTPError):
+            list(pf.iter_pets({'key': 'invalid'}))
+
+
+def test_iter_json_array_waits_for_complete_scalars():
+    """Проверяем, что число, разрезанное на границе кусков, не разбирается по частям"""
+
+    body = b'{"pets": [12345, true, "a,b", {"id": 1}]}'
+    chunks = [body[i:i + 1] for i in range(len(body))]
+
+    assert list(_iter_json_array(chunks, 'pets')) == [12345, True, 'a,b', {'id': 1}]
+
+    # дробное число и число с экспонентой, разрезанные сразу после '.' и 'e'
+    assert list(_iter_json_array([b'{"pets": [12.', b'5, 3]}'], 'pets')) == [12.5, 3]
+    assert list(_iter_json_array([b'{"pets": [1e', b'5, 3]}'], 'pets')) == [1e5, 3]
+
+
+def test_iter_pets_records_metrics_when_stopped_early(fake_server):
+    """Проверяем, что запрос iter_pets попадает в метрики, даже если список не дочитан"""
+
+    metrics = MetricsCollector()
+
+    with PetFriends(base_url=fake_server.url, metrics=metrics) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        for _ in range(3):
+            pf.add_new_pet_without_photo(auth_key, 'Кот', 'кот', '1')
+        pets = pf.iter_pets(auth_key, 'my_pets')
+        next(pets)
+        pets.close()
+
+    assert metrics.snapshot()['GET api/pets']['requests'] == {200: 1}
+
+
+def test_response_cache_uses_conditional_requests(fake_server):
+    """Проверяем, что повторный запрос списка отдаётся по ответу 304, а изменения сбрасывают кэш"""
+
+    with PetFriends(base_url=fake_server.url, response_cache=True) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        _, first = pf.get_list_of_pets(auth_key, 'my_pets')
+        _, second = pf.get_list_of_pets(auth_key, 'my_pets')
+        pf.add_new_pet_without_photo(auth_key, 'Шарик', 'пёс', '1')
+        _, third = pf.get_list_of_pets(auth_key, 'my_pets')
+
+    assert first == second and first is not second
+    assert len(third['pets']) == 1
+
+
+def test_response_cache_returns_copies(fake_server):
+    """Проверяем, что изменение полученного списка не портит закэшированный"""
+
+    with PetFriends(base_url=fake_server.url, response_cache=True, cache_max_age=60) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        pf.add_new_pet_without_photo(auth_key, 'Шарик', 'пёс', '1')
+        _, first = pf.get_list_of_pets(auth_key, 'my_pets')
+        first['pets'].clear()
+        _, second = pf.get_list_of_pets(auth_key, 'my_pets')
+        second['pets'][0]['name'] = 'Бобик'
+        _, third = pf.get_list_of_pets(auth_key, 'my_pets')
+
+    assert len(second['pets']) == 1
+    assert third['pets'][0]['name'] == 'Шарик'
+    assert fake_server.requests_count == 3
+
+
+def test_response_cache_skips_listing_fetched_before_clear(fake_server):
+    """Проверяем, что список, запрошенный до сброса кэша, не сохраняется в кэш после сброса"""
+
+    with PetFriends(base_url=fake_server.url, response_cache=True, cache_max_age=60) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        send = pf._send
+
+        def send_and_clear(method, *args, **kwargs):
+            # изменяющий запрос другого потока завершился, пока список был в пути
+            res = send(method, *args, **kwargs)
+            pf.clear_response_cache()
+            return res
+
+        pf._send = send_and_clear
+        pf.get_list_of_pets(auth_key, 'my_pets')
+        pf._send = send
+
+        assert pf._listings == {}
+
+
+def test_metrics_collect_phases_and_bytes(fake_server, tmp_path):
+    """Проверяем, что метрики собирают фазы, объём данных и пишут трассу в JSONL"""
+
+    trace_path = tmp_path / 'trace.jsonl'
+    metrics = MetricsCollector(trace_path=str(trace_path))
+
+    with PetFriends(base_url=fake_server.url, metrics=metrics) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        pf.add_new_pet(auth_key, 'Барсик', 'кот', '2', cat_photo)
+        pf.get_list_of_pets(auth_key, 'my_pets')
+    metrics.close()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['POST api/pets']['requests'] == {200: 1}
+    assert snapshot['POST api/pets']['bytes_sent'] > os.path.getsize(cat_photo)
+    assert snapshot['GET api/pets']['bytes_received'] > 0
+    assert snapshot['GET api/key']['phases']['connect'] > 0
+    assert 'petfriends_requests_total{endpoint="api/pets",method="POST",status="200"} 1' in metrics.to_prometheus()
+    assert len(trace_path.read_text().splitlines()) == 3
+
+
+def test_metrics_with_recording(fake_server, tmp_path):
+    """Проверяем, что при записи журнала метрики по-прежнему замеряют установку соединения"""
+
+    metrics = MetricsCollector()
+
+    with PetFriends(base_url=fake_server.url, metrics=metrics,
+                    record_path=str(tmp_path / 'petfriends.jsonl')) as pf:
+        pf.get_api_key(valid_email, valid_password)
+
+    assert metrics.snapshot()['GET api/key']['phases']['connect'] > 0
+
+
+def test_metrics_count_each_retry_once(fake_server):
+    """Проверяем, что каждый повтор после 429 учитывается в метриках один раз, а паузы между
+    повторами не считаются загрузкой ответа"""
+
+    metrics = MetricsCollector()
+
+    with PetFriends(base_url=fake_server.url, backoff_factor=0.01, metrics=metrics) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        fake_server.fail_next(3)
+        status, _ = pf.add_new_pet_without_photo(auth_key, 'Шарик', 'пёс', '1')
+
+    snapshot = metrics.snapshot()['POST api/create_pet_simple']
+    assert status == 200
+    assert snapshot['retries'] == 3
+    # паузы перед повторами не попадают в фазу загрузки ответа
+    assert snapshot['phases']['download'] < 0.05 < snapshot['seconds']
+
+
+def test_custom_json_decoder_and_text_errors(fake_server, capsys):
+    """Проверяем, что JSON разбирается переданной функцией, HTML ошибки отдаётся текстом,
+    а методы ничего не печатают"""
+
+    decoded = []
+
+    def loads(data):
+        decoded.append(data)
+        return json.loads(data)
+
+    with PetFriends(base_url=fake_server.url, json_loads=loads) as pf:
+        status, error = pf.get_api_key('nobody@petfriends.local', 'wrong')
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        pf.add_new_pet_without_photo(auth_key, 'Шарик', 'пёс', '1')
+
+    assert status == 403
+    assert isinstance(error, str) and 'Forbidden' in error
+    assert len(decoded) == 2
+    assert capsys.readouterr().out == ''
+
+
+def test_record_and_replay(fake_server, tmp_path):
+    """Проверяем, что записанный журнал воспроизводится без обращения к серверу и без секретов:
+    пароля, ключа и фото в нём нет"""
+
+    log_path = str(tmp_path / 'petfriends.jsonl')
+
+    def scenario(pf):
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        _, pet = pf.add_new_pet(auth_key, 'Барсик', 'кот', '2', cat_photo)
+        pf.update_pet_info(auth_key, pet['id'], 'Мурзик', 'кот', 3)
+        _, listing = pf.get_list_of_pets(auth_key, 'my_pets')
+        return auth_key['key'], listing['pets'], pf.get_api_key('nobody@petfriends.local', 'wrong')
+
+    with PetFriends(base_url=fake_server.url, record_path=log_path) as pf:
+        recorded_key, recorded_pets, recorded_failure = scenario(pf)
+    requests_count = fake_server.requests_count
+
+    with PetFriends(base_url=fake_server.url, replay_path=log_path) as pf:
+        replayed_key, replayed_pets, replayed_failure = scenario(pf)
+        with pytest.raises(requests.ConnectionError):
+            pf.get_list_of_pets({'key': 'unknown'}, 'other')
+
+    assert [pet['id'] for pet in replayed_pets] == [pet['id'] for pet in recorded_pets]
+    assert replayed_pets[0]['name'] == 'Мурзик'
+    assert replayed_pets[0]['pet_photo'].startswith('sha256:')
+    assert replayed_failure == recorded_failure
+    assert replayed_key.startswith('replayed-')
+    assert fake_server.requests_count == requests_count
+    with open(log_path, encoding='utf-8') as f:
+        log = f.read()
+    assert valid_password not in log and '"auth_key"' not in log
+    assert recorded_key not in log
+    assert 'base64' not in log
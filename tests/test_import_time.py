@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+# Бюджет на "from api import PetFriends" в миллисекундах по замеру python -X importtime.
+# На медленных машинах его можно поднять переменной окружения PETFRIENDS_IMPORT_BUDGET_MS
+IMPORT_BUDGET_MS = float(os.environ.get('PETFRIENDS_IMPORT_BUDGET_MS', 60))
+
+# тяжёлые зависимости, которые должны загружаться только при первом запросе
+LAZY_MODULES = ('requests', 'requests_toolbelt', 'urllib3', 'asyncio', 'orjson',
+                'concurrent.futures', 'cassette', 'metrics', 'throttle', 'photo_cache', 'sync')
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_times(statement: str) -> dict:
+    """Выполняет statement в отдельном интерпретаторе с -X importtime и возвращает
+    словарь модуль -> суммарное время импорта в миллисекундах."""
+
+    env = dict(os.environ)
+    # без байткода время ушло бы на компиляцию, а не на импорт
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    times = {}
+    # первый запуск записывает байткод, замер берётся со второго
+    for _ in range(2):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                              cwd=root, env=env, capture_output=True, text=True, check=True)
+        times = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_import_api_is_lazy():
+    """Проверяем, что импорт PetFriends не загружает requests, requests_toolbelt и другие
+    тяжёлые зависимости"""
+
+    times = _import_times('from api import PetFriends')
+
+    assert 'api' in times
+    assert [name for name in LAZY_MODULES if name in times] == []
+
+
+def test_import_api_time_budget():
+    """Проверяем, что импорт PetFriends укладывается в бюджет времени"""
+
+    times = _import_times('from api import PetFriends')
+
+    assert times['api'] < IMPORT_BUDGET_MS
+
@@ -0,0 +1,38 @@
+from models import Pet, PetList
+
+
+pet_data = {'id': 'a1', 'name': 'Барсик', 'animal_type': 'кот', 'age': '2',
+            'pet_photo': 'data:image/jpeg;base64,QUJD', 'created_at': '1700000000.0', 'user_id': 'u1'}
+
+
+def test_pet_from_dict_supports_key_access():
+    """Проверяем, что Pet читается так же, как словарь из ответа сервера"""
+
+    pet = Pet.from_dict(dict(pet_data, extra='ignored'))
+
+    assert pet['id'] == pet.id == 'a1'
+    assert pet['name'] == 'Барсик'
+    assert 'name' in pet
+    assert pet.to_dict() == pet_data
+
+
+def test_pet_photo_is_decoded_on_access():
+    """Проверяем, что фото декодируется из base64 только при обращении"""
+
+    pet = Pet.from_dict(pet_data)
+
+    assert pet.pet_photo == pet_data['pet_photo']
+    assert pet.photo == b'ABC'
+    assert Pet('b2').photo == b''
+
+
+def test_pet_list_lookup_by_id():
+    """Проверяем поиск питомца в PetList по id"""
+
+    pets = PetList.from_dicts([pet_data, dict(pet_data, id='a2', name='Шарик')])
+
+    assert len(pets) == 2
+    assert 'a2' in pets
+    assert 'a3' not in pets
+    assert pets.by_id('a2').name == 'Шарик'
+    assert [pet.id for pet in pets] == ['a1', 'a2']
@@ -0,0 +1,88 @@
+import os
+import shutil
+
+import pytest
+
+from photo_cache import PhotoCache, sniff_image
+
+
+cat_photo = os.path.join(os.path.dirname(__file__), 'images/cat1.jpg')
+dog_photo = os.path.join(os.path.dirname(__file__), 'images/dog1.jpg')
+
+
+def test_photo_cache_reads_file_once():
+    """Проверяем, что повторный запрос того же файла отдаётся из кэша без чтения с диска"""
+
+    cache = PhotoCache()
+    first = cache.get(cat_photo)
+    second = cache.get(cat_photo)
+
+    assert first is second
+    assert first.content_type == 'image/jpeg'
+    assert cache.misses == 1 and cache.hits == 1
+
+
+def test_photo_cache_rereads_changed_file(tmp_path):
+    """Проверяем, что после изменения файла кэш читает его заново"""
+
+    photo = tmp_path / 'pet.jpg'
+    shutil.copy(cat_photo, photo)
+
+    cache = PhotoCache()
+    first = cache.get(photo)
+    shutil.copy(dog_photo, photo)
+    os.utime(photo, ns=(0, 0))
+    second = cache.get(photo)
+
+    assert first.digest != second.digest
+    assert cache.misses == 2
+
+
+def test_photo_cache_keeps_filename_per_path(tmp_path):
+    """Проверяем, что одинаковые картинки под разными путями хранятся один раз, но имя файла
+    для отправки у каждого пути своё"""
+
+    for name in ('a.jpg', 'b.jpg'):
+        shutil.copy(cat_photo, tmp_path / name)
+
+    cache = PhotoCache()
+    cache.get(tmp_path / 'a.jpg')
+    first = cache.get(tmp_path / 'b.jpg')
+    second = cache.get(tmp_path / 'b.jpg')
+
+    assert len(cache) == 1
+    assert cache.hits == 1
+    assert first.filename == second.filename == 'b.jpg'
+    assert cache.get(tmp_path / 'a.jpg').filename == 'a.jpg'
+
+
+def test_photo_cache_evicts_least_recently_used(tmp_path):
+    """Проверяем, что при превышении max_bytes вытесняется давно не использованное фото,
+    а не добавленное раньше всех"""
+
+    # третья картинка - та же кошка с лишним байтом в конце, то есть другое содержимое
+    other_cat = tmp_path / 'cat2.jpg'
+    with open(cat_photo, 'rb') as f:
+        other_cat.write_bytes(f.read() + b'\0')
+
+    cat_size = os.path.getsize(cat_photo)
+    dog_size = os.path.getsize(dog_photo)
+    cache = PhotoCache(max_bytes=cat_size + max(dog_size, cat_size + 1))
+
+    cache.get(cat_photo)
+    cache.get(dog_photo)
+    cache.get(cat_photo)
+    cache.get(other_cat)
+    misses = cache.misses
+    cache.get(cat_photo)
+
+    assert len(cache) == 2
+    assert cache.size_bytes == 2 * cat_size + 1
+    assert cache.misses == misses
+
+
+def test_sniff_image_rejects_non_image():
+    """Проверяем, что данные, не являющиеся картинкой, не проходят проверку"""
+
+    with pytest.raises(ValueError):
+        sniff_image(b'not an image')
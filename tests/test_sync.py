@@ -0,0 +1,107 @@
+import base64
+import os
+
+from api import PetFriends
+from settings import valid_email, valid_password
+from sync import plan_sync
+
+
+cat_photo = os.path.join(os.path.dirname(__file__), 'images/cat1.jpg')
+dog_photo = os.path.join(os.path.dirname(__file__), 'images/dog1.jpg')
+
+
+def _data_uri(path: str) -> str:
+    with open(path, 'rb') as f:
+        return 'data:image/jpeg;base64,' + base64.b64encode(f.read()).decode()
+
+
+def _contents(pets) -> list:
+    return sorted((pet['name'], pet['animal_type'], str(pet['age']), pet['pet_photo']) for pet in pets)
+
+
+def test_plan_sync_minimal_diff():
+    """Проверяем, что план содержит только нужные операции: совпадающие питомцы не трогаются,
+    отличающиеся по полям или фото изменяются, лишние удаляются, недостающие создаются"""
+
+    current = [
+        {'id': '1', 'name': 'Барсик', 'animal_type': 'кот', 'age': '3', 'pet_photo': _data_uri(cat_photo)},
+        {'id': '2', 'name': 'Шарик', 'animal_type': 'пёс', 'age': '5', 'pet_photo': ''},
+        {'id': '3', 'name': 'Мурка', 'animal_type': 'кошка', 'age': '2', 'pet_photo': _data_uri(cat_photo)},
+        {'id': '4', 'name': 'Лишний', 'animal_type': 'ёж', 'age': '1', 'pet_photo': ''},
+    ]
+    desired = [
+        {'name': 'Барсик', 'animal_type': 'кот', 'age': 3, 'pet_photo': cat_photo},
+        {'id': '2', 'name': 'Шарик', 'animal_type': 'пёс', 'age': '6'},
+        {'name': 'Мурка', 'animal_type': 'кошка', 'age': '2', 'pet_photo': dog_photo},
+        {'name': 'Новый', 'animal_type': 'попугай', 'age': '1', 'pet_photo': dog_photo},
+    ]
+
+    plan = plan_sync(current, desired)
+    steps = {operation.pet_id: operation.steps for operation in plan.operations}
+
+    assert plan.unchanged == ['1']
+    assert steps['2'] == ('update',)
+    assert steps['3'] == ('set_photo',)
+    assert steps['4'] == ('delete',)
+    assert steps[None] == ('create',)
+    assert len(plan) == 4
+
+
+def test_plan_sync_recreates_when_update_is_impossible():
+    """Проверяем, что питомец пересоздаётся, если сервер не может изменить его на месте:
+    пустое поле не затирает старое значение, а фото нельзя удалить"""
+
+    current = [{'id': '1', 'name': 'Барсик', 'animal_type': 'кот', 'age': '3', 'pet_photo': _data_uri(cat_photo)}]
+    desired = [{'id': '1', 'name': 'Барсик', 'animal_type': 'кот', 'age': '3'}]
+
+    plan = plan_sync(current, desired)
+
+    assert sorted(operation.steps for operation in plan.operations) == [('create',), ('delete',)]
+
+
+def test_sync_pets_restores_snapshot(fake_server):
+    """Проверяем, что sync_pets возвращает аккаунт к снимку my_pets, выполняя только
+    изменившиеся операции, а повторная синхронизация ничего не меняет"""
+
+    pets = [{'name': 'Пёс %d' % i, 'animal_type': 'собака', 'age': str(i), 'pet_photo': cat_photo}
+            for i in range(6)]
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        assert all(outcome.ok for outcome in pf.create_pets(auth_key, pets))
+        _, snapshot = pf.get_list_of_pets(auth_key, 'my_pets')
+
+        ids = [pet['id'] for pet in snapshot['pets']]
+        pf.delete_pet(auth_key, ids[0])
+        pf.update_pet_info(auth_key, ids[1], 'Рекс', 'собака', '9')
+        pf.add_foto_of_pet(auth_key, ids[2], dog_photo)
+        pf.add_new_pet_without_photo(auth_key, 'Чужак', 'кот', '1')
+
+        requests_before = fake_server.requests_count
+        outcomes = list(pf.sync_pets(auth_key, snapshot['pets'], workers=4))
+        sync_requests = fake_server.requests_count - requests_before
+
+        _, restored = pf.get_list_of_pets(auth_key, 'my_pets')
+        second = list(pf.sync_pets(auth_key, snapshot['pets']))
+
+    assert all(outcome.ok for outcome in outcomes)
+    # список my_pets, изменение, фото, создание удалённого и удаление лишнего
+    assert sync_requests == 5
+    assert _contents(restored['pets']) == _contents(snapshot['pets'])
+    assert ids[1] in [pet['id'] for pet in restored['pets']]
+    assert second == []
+
+
+def test_sync_pets_empty_set_deletes_all(fake_server):
+    """Проверяем, что синхронизация с пустым набором удаляет всех питомцев пользователя"""
+
+    with PetFriends(base_url=fake_server.url) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        for i in range(3):
+            pf.add_new_pet_without_photo(auth_key, 'Кот %d' % i, 'кот', '1')
+
+        outcomes = list(pf.sync_pets(auth_key, []))
+        _, my_pets = pf.get_list_of_pets(auth_key, 'my_pets')
+
+    assert [outcome.item.steps for outcome in outcomes] == [('delete',)] * 3
+    assert my_pets['pets'] == []
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+from api import PetFriends
+from async_api import AsyncPetFriends
+from settings import valid_email, valid_password
+from throttle import AdaptiveConcurrency, TokenBucket, retry_after
+
+
+def test_token_bucket_limits_rate():
+    """Проверяем, что после исчерпания запаса токенов запросы идут не чаще rate в секунду"""
+
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert 0.09 < bucket.reserve() <= 0.1
+    assert 0.19 < bucket.reserve() <= 0.2
+
+
+def test_token_bucket_pause():
+    """Проверяем, что пауза по Retry-After задерживает выдачу токенов"""
+
+    bucket = TokenBucket(rate=100)
+    bucket.pause(0.5)
+
+    assert 0.49 < bucket.reserve() <= 0.51
+
+
+def test_token_bucket_spaces_requests_after_pause():
+    """Проверяем, что запросы, пришедшие во время паузы, после неё идут с интервалом 1/rate,
+    а не все одновременно"""
+
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.pause(2)
+    delays = [bucket.reserve() for _ in range(20)]
+
+    assert 1.9 < delays[0] <= 2.1
+    assert all(0.099 < later - earlier < 0.101 for earlier, later in zip(delays, delays[1:]))
+
+
+def test_adaptive_concurrency_aimd():
+    """Проверяем, что лимит растёт на успешных ответах и уменьшается вдвое на ошибке"""
+
+    limiter = AdaptiveConcurrency(initial=4, minimum=1, maximum=8)
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(200, 0.01)
+    assert 5.5 < limiter.limit < 6
+
+    limiter.acquire()
+    limiter.release(503, 0.01)
+    assert 2.5 < limiter.limit < 3
+
+
+def test_adaptive_concurrency_blocks_over_limit():
+    """Проверяем, что сверх лимита запрос ждёт освобождения места"""
+
+    limiter = AdaptiveConcurrency(initial=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    worker = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    worker.start()
+
+    assert not acquired.wait(0.05)
+    limiter.release(200, 0.01)
+    assert acquired.wait(1)
+    worker.join()
+
+
+def test_retry_after_parsing():
+    """Проверяем разбор заголовка Retry-After в секундах и в виде даты"""
+
+    assert retry_after('3') == 3
+    assert retry_after(None) is None
+    assert retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert retry_after('garbage') is None
+
+
+def test_async_client_respects_rate_limiter(fake_server):
+    """Проверяем, что общий rate_limiter ограничивает и запросы асинхронного клиента"""
+
+    async def list_pets():
+        async with AsyncPetFriends(concurrency=6, base_url=fake_server.url,
+                                   rate_limiter=TokenBucket(rate=20, burst=1)) as apf:
+            _, auth_key = await apf.get_api_key(valid_email, valid_password)
+            started = time.monotonic()
+            results = await asyncio.gather(*(apf.get_list_of_pets(auth_key, 'my_pets') for _ in range(6)))
+            return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(list_pets())
+
+    assert [status for status, _ in results] == [200] * 6
+    assert elapsed >= 0.25
+
+
+def test_client_retries_after_429(fake_server):
+    """Проверяем, что на ответ 429 клиент выжидает паузу и повторяет запрос"""
+
+    limiter = TokenBucket(rate=100)
+    with PetFriends(base_url=fake_server.url, backoff_factor=0.05, rate_limiter=limiter,
+                    concurrency_limiter=AdaptiveConcurrency()) as pf:
+        _, auth_key = pf.get_api_key(valid_email, valid_password)
+        fake_server.fail_next(2)
+        started = time.monotonic()
+        status, result = pf.add_new_pet_without_photo(auth_key, 'Шарик', 'пёс', '1')
+
+    assert status == 200
+    assert result['name'] == 'Шарик'
+    assert time.monotonic() - started >= 0.15
+    assert fake_server.requests_count == 4
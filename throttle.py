@@ -0,0 +1,113 @@
+import email.utils
+import threading
+import time
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов «ведро с токенами».
+
+    Токены пополняются со скоростью rate в секунду до ёмкости burst; каждый запрос забирает
+    один токен. Один объект можно разделять между потоками и клиентами PetFriends, в том числе
+    AsyncPetFriends: его запросы выполняются в пуле потоков, и ожидание токена идёт там же,
+    не блокируя цикл событий.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self._tokens = self.burst
+        # момент, по который посчитаны токены; во время паузы он в будущем
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Забирает токен (возможно, в долг) и возвращает, сколько секунд нужно подождать,
+        прежде чем отправлять запрос."""
+
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated_at:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return self._updated_at - now + delay
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Приостанавливает выдачу токенов на seconds секунд, например по заголовку Retry-After.
+        Токены за время паузы не копятся, поэтому запросы, пришедшие во время паузы, после неё
+        снова идут с интервалом 1/rate, а не все разом."""
+
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated_at:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = max(self._updated_at, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+
+class AdaptiveConcurrency:
+    """Адаптивный лимит одновременных запросов по схеме AIMD.
+
+    Пока запросы проходят успешно и быстрее latency_target, лимит растёт на единицу за каждые
+    limit успешных ответов (аддитивное увеличение). На ответы 429 и 5xx, сетевые ошибки и
+    ответы медленнее latency_target лимит умножается на backoff (мультипликативное уменьшение),
+    не чаще раза за время одного запроса, чтобы пачка одновременных ошибок не обрушила лимит
+    до минимума.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64,
+                 latency_target: float = None, backoff: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= max(int(self.limit), self.minimum):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, status: int | None, latency: float):
+        """Освобождает место и подстраивает лимит по статусу ответа (None - сетевая ошибка)
+        и его длительности."""
+
+        failed = status is None or status == 429 or status >= 500
+        slow = self.latency_target is not None and latency > self.latency_target
+
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if failed or slow:
+                if now - self._last_decrease > latency:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+def retry_after(value: str | None) -> float | None:
+    """Разбирает заголовок Retry-After (секунды или HTTP дата) в число секунд ожидания."""
+
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0.0)